@@ -0,0 +1,176 @@
+"""
+Benchmarks for the status pipeline.
+
+Measures the time and memory of each stage a poll goes through on the checked-in fixture
+pages: parsing with every installed extract_status_data backend, whole and cut short by
+the streaming SectionScanner, building snapshots, the turn history rows, parse_time_string,
+the embed builders and the mention strings. Run benchmarks.check_backends first to make
+sure the backends being compared return the same results.
+
+Usage, from the repository root:
+
+    python -m benchmarks.bench_status
+    python -m benchmarks.bench_status --save baseline.json
+    python -m benchmarks.bench_status --compare baseline.json --threshold 1.25
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.pages import FIXTURES_FOLDER, load_fixtures
+from status.capture_status import BACKENDS, SectionScanner, extract_status_data_reference, parse_time_string
+from status.embeds import details_embed, reminder_mentions, status_embed, turn_mentions
+from status.history import history_rows
+from status.fetcher import STREAM_CHUNK
+from status.snapshot import GameSnapshot
+
+TIME_STRINGS = [
+    "17 hours, 4 minutes",
+    "1 day, 2 hours, 33 minutes",
+    "45 minutes",
+    "3 days",
+    "Waiting for submissions",
+    "",
+]
+
+
+def scan(body: bytes) -> bytes:
+    """Feed a page to a SectionScanner the way the fetcher streams it, returning the part that is parsed."""
+    scanner = SectionScanner()
+    for start in range(0, len(body), STREAM_CHUNK):
+        if scanner.feed(body[start:start + STREAM_CHUNK]):
+            return bytes(memoryview(scanner.buffer)[:scanner.end])
+    return bytes(scanner.buffer)
+
+
+def measure(function, iterations: int) -> dict:
+    """
+    Time ``function`` over ``iterations`` calls and trace the memory of a single call.
+
+    :return: The mean time per call in microseconds and the peak and retained memory of a call in KiB.
+    """
+    function()  # Warm up
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    mean_us = (time.perf_counter() - started_at) / iterations * 1e6
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+        # Parse trees hold reference cycles, only count what survives a collection
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"mean_us": mean_us, "peak_kib": peak / 1024, "retained_kib": retained / 1024}
+
+
+def run(fixtures: dict, backends: list, iterations: int) -> dict:
+    results = {}
+    registered_cache = {}
+    for name, page in fixtures.items():
+        for backend in backends:
+            results[f"parse[{backend}] {name}"] = measure(lambda: BACKENDS[backend](page), iterations)
+        body = page.encode("utf-8")
+        results[f"scan {name}"] = measure(lambda: scan(body), iterations)
+        streamed = scan(body)
+        print(f"note: streaming parses {len(streamed)} of the {len(body)} bytes of {name}")
+        for backend in backends:
+            results[f"parse[{backend}, streamed] {name}"] = measure(
+                lambda: BACKENDS[backend](streamed, "utf-8"), iterations
+            )
+
+        lobby_name, players, game_info = extract_status_data_reference(page)
+        results[f"snapshot {name}"] = measure(
+            lambda: GameSnapshot.from_page("1", lobby_name, players, game_info), iterations
+        )
+        snapshot = GameSnapshot.from_page("1", lobby_name, players, game_info)
+        if not snapshot.has_status:
+            continue
+        registered = registered_cache.setdefault(
+            name, {nation.name: 100000000000000000 + i for i, nation in enumerate(snapshot.nations)}
+        )
+        results[f"history_rows[new] {name}"] = measure(lambda: history_rows(None, snapshot), iterations)
+        results[f"history_rows[same] {name}"] = measure(lambda: history_rows(snapshot, snapshot), iterations)
+        results[f"details_embed {name}"] = measure(lambda: details_embed(snapshot, registered), iterations)
+        results[f"status_embed {name}"] = measure(lambda: status_embed(snapshot), iterations)
+        results[f"turn_mentions {name}"] = measure(lambda: turn_mentions(registered), iterations)
+        results[f"reminder_mentions {name}"] = measure(lambda: reminder_mentions(snapshot, registered), iterations)
+
+    results["parse_time_string"] = measure(
+        lambda: [parse_time_string(text) for text in TIME_STRINGS], iterations
+    )
+    return results
+
+
+def print_results(results: dict, baseline: dict = None) -> None:
+    width = max(len(stage) for stage in results)
+    header = f"{'stage':<{width}}  {'mean':>10}  {'peak':>10}  {'retained':>10}"
+    if baseline:
+        header += f"  {'vs base':>8}"
+    print(header)
+    print("-" * len(header))
+    for stage, result in results.items():
+        line = (
+            f"{stage:<{width}}  {result['mean_us']:>8.1f}us  {result['peak_kib']:>7.1f}KiB"
+            f"  {result['retained_kib']:>7.1f}KiB"
+        )
+        if baseline and stage in baseline:
+            line += f"  {result['mean_us'] / baseline[stage]['mean_us']:>7.2f}x"
+        print(line)
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list:
+    return [
+        stage
+        for stage, result in results.items()
+        if stage in baseline and result["mean_us"] > baseline[stage]["mean_us"] * threshold
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the status pipeline on fixture pages.")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls timed per stage.")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="Backend to run, repeatable. Defaults to all installed backends.")
+    parser.add_argument("--fixtures", default="*.html", help="Glob of fixture pages to run.")
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare with the results saved in this JSON file.")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown against the baseline reported as a regression.")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        print(f"No fixtures match {args.fixtures} in {FIXTURES_FOLDER}")
+        return 1
+    backends = args.backend or sorted(BACKENDS)
+
+    results = run(fixtures, backends, args.iterations)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=4)
+    if baseline:
+        slower = regressions(results, baseline, args.threshold)
+        if slower:
+            print(f"\n{len(slower)} stage(s) slower than {args.threshold}x the baseline:")
+            for stage in slower:
+                print(f"  {stage}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Check that every installed extract_status_data backend reads the fixture pages the same way
+as the reference backend, from text and from bytes, and that they all reject a page without
+a lobby title with a ValueError.
+
+Usage, from the repository root:
+
+    python -m benchmarks.check_backends
+    python -m benchmarks.check_backends --backend lxml
+"""
+
+import argparse
+import sys
+
+from benchmarks.pages import FIXTURES_FOLDER, load_fixtures
+from status.capture_status import BACKENDS, extract_status_data_reference
+
+# Pages the backends are allowed to recover from differently
+LENIENT_FIXTURES = {"malformed.html"}
+
+# Pages every backend must reject for missing their lobby title
+UNTITLED_PAGES = ["", "<html><body><p>Game not found</p></body></html>"]
+
+
+def check_backends(fixtures: dict, backends: list) -> bool:
+    """
+    Compare the output of every backend with the reference backend.
+
+    :return: False if a backend differs on a page that is not lenient.
+    """
+    ok = True
+    for name, page in fixtures.items():
+        expected = extract_status_data_reference(page)
+        for backend in backends:
+            for kind, content in (("text", page), ("bytes", page.encode("utf-8"))):
+                if BACKENDS[backend](content, "utf-8") == expected:
+                    continue
+                if name in LENIENT_FIXTURES:
+                    print(f"note: {backend} recovers {name} from {kind} differently from the reference")
+                else:
+                    print(f"MISMATCH: {backend} differs from the reference on {name} from {kind}")
+                    ok = False
+    return ok
+
+
+def check_untitled(backends: list) -> bool:
+    """
+    Check that every backend raises ValueError on pages without a lobby title.
+
+    :return: False if a backend returns or raises something else.
+    """
+    ok = True
+    for page in UNTITLED_PAGES:
+        for backend in backends:
+            try:
+                BACKENDS[backend](page)
+            except ValueError:
+                continue
+            except Exception as e:
+                print(f"MISMATCH: {backend} raises {type(e).__name__} instead of ValueError on {page!r}")
+            else:
+                print(f"MISMATCH: {backend} accepts the untitled page {page!r}")
+            ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check that the parser backends agree on the fixture pages.")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="Backend to check, repeatable. Defaults to all installed backends.")
+    parser.add_argument("--fixtures", default="*.html", help="Glob of fixture pages to check.")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        print(f"No fixtures match {args.fixtures} in {FIXTURES_FOLDER}")
+        return 1
+    backends = args.backend or sorted(BACKENDS)
+
+    ok = check_untitled(backends)
+    ok = check_backends(fixtures, backends) and ok
+    if ok:
+        print(f"{len(backends)} backend(s) agree on {len(fixtures)} fixture(s)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Local stand-in for the blitzserver.
+
+Serves generated ``/game/{id}`` pages whose turns advance on a fixed schedule, with nations
+submitting progressively during each turn. Every request and every turn change is recorded
+so a load test can compute fetch rates and notification latency.
+
+Run ``python -m benchmarks.fake_blitzserver --games 100`` to browse it by hand.
+"""
+
+import argparse
+import random
+import time
+
+from aiohttp import web
+
+from benchmarks.pages import NATIONS, render_game_page
+
+
+def format_remaining(seconds: float) -> str:
+    """Format a duration the way the blitzserver shows the time until the next turn."""
+    minutes = max(0, int(seconds // 60))
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    parts = []
+    if days:
+        parts.append(f"{days} day{'s' if days != 1 else ''}")
+    parts.append(f"{hours} hours")
+    parts.append(f"{minutes} minutes")
+    return ", ".join(parts)
+
+
+class FakeGame:
+    """A game whose turn advances every ``turn_length`` seconds."""
+
+    def __init__(self, game_id: str, turn_length: float, nations: int, rng: random.Random, started_at: float = None) -> None:
+        self.game_id = game_id
+        self.turn_length = turn_length
+        self.rng = rng
+        self.nations = rng.sample(NATIONS, nations)
+        self.turn = 1
+        self.turn_started_at = time.time() if started_at is None else started_at
+        self.turn_changes = []  # (turn, wall clock time the turn started)
+        self.requests = 0
+        self._draw_submissions()
+
+    @property
+    def deadline(self) -> float:
+        return self.turn_started_at + self.turn_length
+
+    def _draw_submissions(self) -> None:
+        # The fraction of the turn after which each nation submits, or None if it never does
+        self.submit_after = [
+            None if self.rng.random() < 0.15 else self.rng.uniform(0.05, 0.95)
+            for _ in self.nations
+        ]
+
+    def advance(self, now: float) -> None:
+        """Roll the game forward to ``now``, recording the exact time of every turn change."""
+        while now >= self.deadline:
+            self.turn_started_at = self.deadline
+            self.turn += 1
+            self.turn_changes.append((self.turn, self.turn_started_at))
+            self._draw_submissions()
+
+    def render(self, now: float) -> str:
+        self.advance(now)
+        elapsed = (now - self.turn_started_at) / self.turn_length
+        players = [
+            (nation, epithet, "submitted" if after is not None and elapsed >= after else "unsubmitted")
+            for (nation, epithet), after in zip(self.nations, self.submit_after)
+        ]
+        return render_game_page(
+            f"Load Test {self.game_id}",
+            f"Turn {self.turn}",
+            format_remaining(self.deadline - now),
+            address=f"127.0.0.1:{30000 + int(self.game_id) % 10000}",
+            players=players,
+            csrf_token=f"{self.rng.getrandbits(64):016x}",
+        )
+
+
+class FakeBlitzserver:
+    """An aiohttp application serving a set of FakeGame pages."""
+
+    def __init__(self) -> None:
+        self.games = {}
+        self.requests = 0
+        self.outages = []  # (start, end) wall clock times during which every page fails with a 503
+        self.failed_requests = 0
+        self.started_at = time.time()
+        self.app = web.Application()
+        self.app.router.add_get("/game/{game_id}", self.game_page)
+        self.runner = None
+
+    def add_game(self, game: FakeGame) -> None:
+        self.games[game.game_id] = game
+
+    def add_outage(self, start: float, length: float) -> None:
+        self.outages.append((start, start + length))
+
+    async def game_page(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        now = time.time()
+        if any(start <= now < end for start, end in self.outages):
+            self.failed_requests += 1
+            return web.Response(status=503, text="Service unavailable")
+        game = self.games.get(request.match_info["game_id"])
+        if game is None:
+            return web.Response(status=404, text="Game not found")
+        game.requests += 1
+        return web.Response(text=game.render(time.time()), content_type="text/html")
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Start serving.
+
+        :return: The base URL of the server.
+        """
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        port = self.runner.addresses[0][1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+def create_games(count: int, min_turn: float, max_turn: float, seed: int = 520) -> list:
+    """Create ``count`` games with IDs from 1000 and turn lengths between ``min_turn`` and ``max_turn`` seconds."""
+    rng = random.Random(seed)
+    now = time.time()
+    games = []
+    for i in range(count):
+        turn_length = rng.uniform(min_turn, max_turn)
+        game = FakeGame(
+            str(1000 + i),
+            turn_length,
+            rng.randint(4, 24),
+            random.Random(rng.getrandbits(32)),
+            # Spread the first turn changes over the turn length
+            started_at=now - rng.uniform(0, turn_length),
+        )
+        games.append(game)
+    return games
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve fake blitzserver game pages.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--min-turn", type=float, default=600, help="Shortest turn in seconds.")
+    parser.add_argument("--max-turn", type=float, default=3600, help="Longest turn in seconds.")
+    parser.add_argument("--port", type=int, default=8520)
+    args = parser.parse_args()
+
+    server = FakeBlitzserver()
+    for game in create_games(args.games, args.min_turn, args.max_turn):
+        server.add_game(game)
+    print(f"Serving games 1000-{999 + args.games} on http://127.0.0.1:{args.port}")
+    web.run_app(server.app, host="127.0.0.1", port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Load test for the watch subsystem.
+
+Starts a FakeBlitzserver with N games, loads the Dominions cog against it with a mock bot,
+watches every game from one or more mock channels through the cog's watch command, and
+reports the fetch rate, the latency between a simulated turn change and its notification,
+and the CPU time and memory used by the process. The fake server runs in the same process, so its
+share of the CPU time is included.
+
+Usage, from the repository root:
+
+    python -m benchmarks.load_test --games 300 --duration 120 --min-turn 30 --max-turn 90
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+import aiohttp
+import aiosqlite
+
+from benchmarks.fake_blitzserver import FakeBlitzserver, create_games
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class MockMessage:
+    def __init__(self, channel, content: str = None, embed=None) -> None:
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.sent_at = time.time()
+        self.id = int(self.sent_at * 1000)
+
+    async def edit(self, content: str = None, embed=None, **kwargs) -> None:
+        self.content = content if content is not None else self.content
+        self.embed = embed if embed is not None else self.embed
+        self.channel.edits.append((time.time(), self))
+
+
+class MockChannel:
+    """A channel that records the messages sent to it instead of calling Discord."""
+
+    def __init__(self, channel_id: int, guild=None) -> None:
+        self.id = channel_id
+        self.guild = guild
+        self.messages = []
+        self.edits = []
+
+    async def send(self, content: str = None, embed=None, **kwargs) -> MockMessage:
+        message = MockMessage(self, content, embed)
+        self.messages.append(message)
+        return message
+
+    def get_partial_message(self, message_id: int) -> MockMessage:
+        for message in self.messages:
+            if message.id == message_id:
+                return message
+        raise LookupError(message_id)
+
+    async def fetch_message(self, message_id: int) -> MockMessage:
+        return self.get_partial_message(message_id)
+
+
+class MockGuild:
+    def __init__(self, guild_id: int) -> None:
+        self.id = guild_id
+        self.name = f"Guild {guild_id}"
+        self.members = []
+
+
+class MockAuthor:
+    def __init__(self, user_id: int) -> None:
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+
+
+class MockContext:
+    """The subset of a hybrid command context the Dominions cog uses."""
+
+    def __init__(self, channel: MockChannel, author_id: int = 1) -> None:
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = MockAuthor(author_id)
+        self.interaction = None
+        self.replies = []
+
+    async def send(self, content: str = None, embed=None, **kwargs) -> MockMessage:
+        message = MockMessage(self.channel, content, embed)
+        self.replies.append(message)
+        return message
+
+
+class MockBot:
+    """The attributes of DiscordBot the Dominions cog relies on."""
+
+    def __init__(self, config: dict, http_session: aiohttp.ClientSession) -> None:
+        self.config = config
+        self.http_session = http_session
+        self.logger = logging.getLogger("load_test")
+        self.channels = {}
+        self.database = None
+
+    async def wait_until_ready(self) -> None:
+        pass
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+    async def fetch_channel(self, channel_id: int):
+        return self.channels[channel_id]
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+
+def load_config(base_url: str, overrides: dict) -> dict:
+    with open(os.path.join(REPOSITORY, "config.json")) as f:
+        config = json.load(f)
+    config["blitzserver_url"] = base_url
+    for section, values in overrides.items():
+        config.setdefault(section, {}).update(values)
+    return config
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def open_database(path: str):
+    """Create a bot database with the repository schema, the way DiscordBot.setup_hook does."""
+    from database import DatabaseManager
+
+    connection = await aiosqlite.connect(path)
+    with open(os.path.join(REPOSITORY, "database", "schema.sql")) as file:
+        await connection.executescript(file.read())
+    await connection.commit()
+    database = DatabaseManager(connection=connection)
+    await database.setup()
+    return database
+
+
+async def run(args) -> dict:
+    sys.path.insert(0, REPOSITORY)
+    from cogs.dominions import Dominions
+
+    server = FakeBlitzserver()
+    games = create_games(args.games, args.min_turn, args.max_turn, seed=args.seed)
+    for game in games:
+        server.add_game(game)
+    base_url = await server.start()
+
+    overrides = {
+        "watch": {
+            "poll_workers": args.workers,
+            "min_interval": args.min_interval,
+            "max_interval": args.max_interval,
+        },
+        "http": {"request_rate": args.request_rate, "request_burst": args.request_rate},
+    }
+    if args.config:
+        overrides.update(json.loads(args.config))
+    connector = aiohttp.TCPConnector(limit=args.workers * 2)
+    session = aiohttp.ClientSession(connector=connector)
+    bot = MockBot(load_config(base_url, overrides), session)
+
+    # The cog keeps its data files relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="dominions-load-")
+    os.chdir(workdir)
+    bot.database = await open_database(os.path.join(workdir, "database.db"))
+    cog = Dominions(bot)
+    bot.cogs = {"dominions": cog}
+    await cog.cog_load()
+
+    guild = MockGuild(1)
+    channels = {}
+    cpu_started_at = time.process_time()
+    started_at = time.time()
+    for i, game in enumerate(games):
+        channels[game.game_id] = []
+        for j in range(args.subscribers):
+            channel = MockChannel(10_000 + i * args.subscribers + j, guild)
+            bot.channels[channel.id] = channel
+            channels[game.game_id].append(channel)
+            await cog.watch.callback(cog, MockContext(channel), game.game_id)
+    if args.outage:
+        server.add_outage(time.time() + args.outage_at, args.outage)
+
+    await asyncio.sleep(args.duration)
+    ended_at = time.time()
+    cpu_used = time.process_time() - cpu_started_at
+    requests = server.requests
+    stats = cog.scheduler.stats()
+    outbox_stats = cog.outbox.stats()
+    governor_stats = cog.fetcher.governor.stats()
+    fetch_stats = cog.fetcher.stats()
+    breaker_stats = cog.fetcher.breaker.stats()
+    watched = len(cog.subscriptions)
+    await cog.cog_unload()
+    async with await bot.database.connection.execute("SELECT COUNT(*) FROM turn_history") as cursor:
+        history_rows = (await cursor.fetchone())[0]
+    await session.close()
+    await bot.database.close()
+    await server.stop()
+
+    latencies = []
+    missed = 0
+    turn_messages = tuple(cog.custom_turn_message_list)
+    for game in games:
+        notifications = [
+            message.sent_at
+            for message in channels[game.game_id][0].messages
+            if message.content and message.content.startswith(turn_messages)
+        ]
+        for turn, changed_at in game.turn_changes:
+            # Skip changes before the first poll of the game set its baseline, and changes
+            # the bot had no time to notice before the end of the run
+            if changed_at < started_at + args.max_interval or changed_at > ended_at - args.max_interval:
+                continue
+            later = [sent_at for sent_at in notifications if sent_at >= changed_at]
+            if later:
+                latencies.append(min(later) - changed_at)
+            else:
+                missed += 1
+
+    elapsed = ended_at - started_at
+    return {
+        "games": args.games,
+        "subscribers_per_game": args.subscribers,
+        "messages_sent": sum(len(channel.messages) for subscribed in channels.values() for channel in subscribed),
+        "duration_s": elapsed,
+        "requests": requests,
+        "fetch_rate_per_s": requests / elapsed,
+        "requests_per_game_per_min": requests / args.games / (elapsed / 60),
+        "turn_changes": len(latencies) + missed,
+        "missed_turn_changes": missed,
+        "latency_median_s": statistics.median(latencies) if latencies else None,
+        "latency_p90_s": percentile(latencies, 0.9) if latencies else None,
+        "latency_max_s": max(latencies) if latencies else None,
+        "cpu_s": cpu_used,
+        "cpu_percent": cpu_used / elapsed * 100,
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "scheduler_max_lag_s": stats["max_lag"],
+        "poll_errors": stats["errors"],
+        "outbox_latency_avg_s": outbox_stats["latency_avg"],
+        "outbox_latency_p90_s": outbox_stats["latency_p90"],
+        "outbox_coalesced": outbox_stats["coalesced"],
+        "history_rows": history_rows,
+        "fetch_hit_rate": fetch_stats["hit_rate"],
+        "bytes_read": fetch_stats["bytes_read"],
+        "bytes_parsed": fetch_stats["bytes_parsed"],
+        "bytes_not_downloaded": fetch_stats["bytes_not_downloaded"],
+        "bytes_not_parsed": fetch_stats["bytes_not_parsed"],
+        "closed_early": fetch_stats["closed_early"],
+        "budget_utilization": governor_stats["utilization"],
+        "budget_avg_wait_s": governor_stats["avg_wait"]["poll"],
+        "failed_requests": server.failed_requests,
+        "breaker_trips": breaker_stats["trips"],
+        "watched_at_end": watched,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the watch subsystem against a fake blitzserver.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--subscribers", type=int, default=1, help="Channels watching each game.")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run after all watches started.")
+    parser.add_argument("--min-turn", type=float, default=30, help="Shortest simulated turn in seconds.")
+    parser.add_argument("--max-turn", type=float, default=90, help="Longest simulated turn in seconds.")
+    parser.add_argument("--min-interval", type=float, default=2, help="watch.min_interval used by the cog.")
+    parser.add_argument("--max-interval", type=float, default=10, help="watch.max_interval used by the cog.")
+    parser.add_argument("--request-rate", type=float, default=100, help="http.request_rate used by the cog.")
+    parser.add_argument("--workers", type=int, default=8, help="watch.poll_workers used by the cog.")
+    parser.add_argument("--config", help="JSON object of extra config sections to merge, e.g. '{\"parser\": {\"pool_mode\": \"thread\"}}'.")
+    parser.add_argument("--outage", type=float, default=0, help="Seconds the server answers every request with a 503.")
+    parser.add_argument("--outage-at", type=float, default=10, help="Seconds after all watches started the outage begins.")
+    parser.add_argument("--seed", type=int, default=520)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run(args))
+    for key, value in results.items():
+        print(f"{key:<28} {value:.3f}" if isinstance(value, float) else f"{key:<28} {value}")
+
+
+if __name__ == "__main__":
+    main()
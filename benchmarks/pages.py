@@ -0,0 +1,177 @@
+"""
+Generator for blitzserver-like game pages.
+
+The pages mimic the markup extract_status_data reads: the lobby title in an ``h1``, the
+``#status`` pane with its key/value table and the ``.players`` striped tables, surrounded
+by the navigation, scripts and turn log that make up the rest of a real page.
+
+Run ``python -m benchmarks.pages`` to regenerate the checked-in fixtures.
+"""
+
+import glob
+import html
+import os
+import random
+
+FIXTURES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+NATIONS = [
+    ("Arcoscephale", "Golden Era"), ("Ermor", "New Faith"), ("Ulm", "Enigma of Steel"),
+    ("Marverni", "Time of Druids"), ("Sauromatia", "Amazon Queens"), ("T'ien Ch'i", "Spring and Autumn"),
+    ("Machaka", "Lion Kings"), ("Mictlan", "Reign of Blood"), ("Abysia", "Children of Flame"),
+    ("Caelum", "Eagle Kings"), ("C'tis", "Lizard Kings"), ("Pangaea", "Age of Revelry"),
+    ("Agartha", "Pale Ones"), ("Tir na n'Og", "Land of the Ever Young"), ("Fomoria", "The Cursed Ones"),
+    ("Vanheim", "Age of Vanir"), ("Helheim", "Dusk and Death"), ("Niefelheim", "Sons of Winter"),
+    ("Rus", "Sons of Heaven"), ("Kailasa", "Rise of the Ape Kings"), ("Lanka", "Land of Demons"),
+    ("Yomi", "Oni Kings"), ("Hinnom", "Sons of the Fallen"), ("Ur", "The First City"),
+    ("Berytos", "Phoenix Empire"), ("Xibalba", "Vigil of the Sun"), ("Mekone", "Brazen Giants"),
+    ("Ubar", "Kingdom of the Unseen"), ("Atlantis", "Emergence of the Deep Ones"), ("R'lyeh", "Time of Aboleths"),
+]
+
+def load_fixtures(pattern: str = "*.html") -> dict:
+    """Return the text of the fixture pages matching ``pattern`` by file name."""
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_FOLDER, pattern))):
+        with open(path, encoding="utf-8") as f:
+            fixtures[os.path.basename(path)] = f.read()
+    return fixtures
+
+
+PLAYER_STATUSES = ["submitted", "unsubmitted", "unfinished", "computer", "dead"]
+
+
+def nation_row(nation: str, epithet: str, status: str, index: int) -> str:
+    return (
+        f'<tr class="disciple team-{index % 4 + 1}">'
+        f'<td class="nation-icon"><img src="/static/flags/{index}.png" alt=""></td>'
+        f'<td class="nation-name wide-column"><b>{html.escape(nation)}</b>'
+        f'<span class="epithet">, {html.escape(epithet)}</span></td>'
+        f'<td class="player">player{index}</td>'
+        f'<td class="status">{status}</td>'
+        f'</tr>'
+    )
+
+
+def render_game_page(
+    lobby_name: str,
+    status: str,
+    next_turn: str = None,
+    address: str = "blitzserver.net:30520",
+    players: list = (),
+    padding: int = 20,
+    csrf_token: str = "5f1d2c3b4a596877",
+) -> str:
+    """
+    Render a game page.
+
+    :param lobby_name: The name of the lobby shown in the title.
+    :param status: The text of the Status row.
+    :param next_turn: The text of the Next Turn row, omitted if None.
+    :param address: The text of the Address row, omitted if None.
+    :param players: A list of (nation, epithet, status) tuples.
+    :param padding: The number of navigation links and turn log lines around the status.
+    :param csrf_token: The token rendered in the page head, which changes between requests on the real server.
+    """
+    info_rows = [("Status", status)]
+    if address is not None:
+        info_rows.append(("Address", address))
+    if next_turn is not None:
+        info_rows.append(("Next turn", next_turn))
+    info_rows += [("Era", "Middle"), ("Map", "Blitz 40"), ("Thrones", "3/5/0 (6 ap)")]
+
+    nav = "".join(f'<li><a href="/games?page={i}">Games {i}</a></li>' for i in range(padding))
+    log = "".join(
+        f'<tr><td>Turn {i}</td><td>{i * 7 % 24}:{i * 13 % 60:02d}</td><td>Processed in {i % 5 + 1}s</td></tr>'
+        for i in range(padding * 5)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{html.escape(lobby_name)} - Blitzserver</title>
+<link rel="stylesheet" href="/static/style.css">
+<script>window.csrfToken = "{csrf_token}";</script>
+</head>
+<body>
+<nav class="navbar"><ul>{nav}</ul></nav>
+<main class="container">
+<h1>
+    {html.escape(lobby_name)}
+</h1>
+<ul class="tabs"><li><a href="#status">Status</a></li><li><a href="#log">Log</a></li><li><a href="#settings">Settings</a></li></ul>
+<div id="status" class="tab-content">
+<div class="pane status">
+<table>
+{"".join(f'<tr><td>{key}</td><td>{html.escape(value)}</td></tr>' for key, value in info_rows)}
+</table>
+</div>
+<div class="players">
+<table class="striped-table">
+<tr><th></th><th>Nation</th><th>Player</th><th>Status</th></tr>
+{"".join(nation_row(nation, epithet, player_status, i) for i, (nation, epithet, player_status) in enumerate(players))}
+</table>
+</div>
+</div>
+<div id="log" class="tab-content"><table class="log">{log}</table></div>
+</main>
+<footer>Rendered for you by the blitzserver</footer>
+</body>
+</html>
+"""
+
+
+def random_players(count: int, rng: random.Random) -> list:
+    """Return ``count`` nations with random player statuses."""
+    return [
+        (nation, epithet, rng.choices(PLAYER_STATUSES, weights=[5, 4, 1, 1, 1])[0])
+        for nation, epithet in rng.sample(NATIONS, count)
+    ]
+
+
+MALFORMED_PAGE = """<html><head><title>Broken</title>
+<body>
+<h1>Broken <i>Lobby</h1>
+<div id="status"><div class="pane status"><table>
+<tr><td>Status<td>Turn 12
+<tr><td>Next turn</td><td>3 hours, 1 minute</td>
+<tr><td>Address</td></tr>
+</table>
+<div class="players"><table class="striped-table">
+<tr class="disciple"><td class="nation-name wide-column"><b>Ulm<span class="epithet">, Enigma of Steel</span></td><td>submitted
+<tr class="disciple"><td class="nation-name wide-column"><b>Ermor</b></td><td>unsubmitted</td>
+<tr class="human"><td class="nation-name wide-column"><b>Spectator</b></td><td>-</td></tr>
+</div>
+"""
+
+
+def fixture_pages() -> dict:
+    """Return the fixture pages by file name."""
+    rng = random.Random(520)
+    return {
+        "small_lobby.html": render_game_page(
+            "Friday Blitz", "Turn 3", "17 hours, 4 minutes", players=random_players(4, rng), padding=5
+        ),
+        "large_game.html": render_game_page(
+            "Big Middle Era Brawl", "Turn 48", "1 day, 2 hours, 33 minutes", players=random_players(24, rng), padding=60
+        ),
+        "waiting_game.html": render_game_page(
+            "Waiting Room", "Turn 1", "Waiting for submissions", players=random_players(8, rng), padding=20
+        ),
+        "won_game.html": render_game_page(
+            "Old Grudges", "Won by Ulm", None, players=random_players(12, rng), padding=40
+        ),
+        "no_status.html": render_game_page("Missing Pane", "Turn 1").replace('id="status"', 'id="overview"'),
+        "malformed.html": MALFORMED_PAGE,
+    }
+
+
+def write_fixtures() -> None:
+    os.makedirs(FIXTURES_FOLDER, exist_ok=True)
+    for name, page in fixture_pages().items():
+        with open(os.path.join(FIXTURES_FOLDER, name), "w", encoding="utf-8") as f:
+            f.write(page)
+        print(f"Wrote {name} ({len(page.encode())} bytes)")
+
+
+if __name__ == "__main__":
+    write_fixtures()
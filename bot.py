@@ -4,7 +4,9 @@ import os
 import platform
 import random
 import sys
+import time
 
+import aiohttp
 import aiosqlite
 import discord
 from discord.ext import commands, tasks
@@ -52,15 +54,55 @@ intents.message_content = True
 intents.presences = True
 """
 
-intents = discord.Intents.all()
+
+
+def build_intents(names) -> discord.Intents:
+    """
+    Build the intents from the ``gateway.intents`` config: "all", "default" or a list of intent names.
+    """
+    if names == "all":
+        return discord.Intents.all()
+    if names == "default":
+        return discord.Intents.default()
+    unknown = [name for name in names if name not in discord.Intents.VALID_FLAGS]
+    if unknown:
+        sys.exit(f"Unknown intents in 'config.json': {', '.join(unknown)}")
+    intents = discord.Intents.none()
+    for name in names:
+        setattr(intents, name, True)
+    return intents
+
+
+def build_member_cache_flags(names, intents: discord.Intents) -> discord.MemberCacheFlags:
+    """
+    Build the member cache flags from the ``gateway.member_cache`` config, a list of flag names.
+    Without it, members are cached as far as the intents allow.
+    """
+    if names is None:
+        return discord.MemberCacheFlags.from_intents(intents)
+    unknown = [name for name in names if name not in discord.MemberCacheFlags.VALID_FLAGS]
+    if unknown:
+        sys.exit(f"Unknown member cache flags in 'config.json': {', '.join(unknown)}")
+    flags = discord.MemberCacheFlags.none()
+    for name in names:
+        setattr(flags, name, True)
+    return flags
+
 
 """
-Uncomment this if you want to use prefix (normal) commands.
-It is recommended to use slash commands and therefore not use prefix commands.
+The intents, member cache and message cache are set in the "gateway" section of config.json.
+Without it every intent is enabled and the whole member list of every guild is cached, which
+is by far the largest part of the memory of the bot in large guilds and makes startup wait
+for every guild to be chunked.
 
-If you want to use prefix commands, make sure to also enable the intent below in the Discord developer portal.
+Prefix (normal) commands need the message_content intent, which must also be enabled in the
+Discord developer portal.
 """
-intents.message_content = True
+gateway_config = config.get("gateway", {})
+intents = build_intents(gateway_config.get("intents", "all"))
+if "intents" not in gateway_config:
+    intents.message_content = True
+member_cache_flags = build_member_cache_flags(gateway_config.get("member_cache"), intents)
 
 # Setup both of the loggers
 
@@ -102,8 +144,9 @@ logger.setLevel(logging.INFO)
 # Console handler
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(LoggingFormatter())
-# File handler
-file_handler = logging.FileHandler(filename="discord.log", encoding="utf-8", mode="w")
+# File handler, only opened on the first record so that parser pool workers, which import this
+# module again, do not truncate the log
+file_handler = logging.FileHandler(filename="discord.log", encoding="utf-8", mode="w", delay=True)
 file_handler_formatter = logging.Formatter(
     "[{asctime}] [{levelname:<8}] {name}: {message}", "%Y-%m-%d %H:%M:%S", style="{"
 )
@@ -119,6 +162,10 @@ class DiscordBot(commands.Bot):
         super().__init__(
             command_prefix=commands.when_mentioned_or(config["prefix"]),
             intents=intents,
+            member_cache_flags=member_cache_flags,
+            chunk_guilds_at_startup=gateway_config.get("chunk_guilds_at_startup", intents.members),
+            # 0 would mean the default of 1000 to discord.py, None disables the message cache
+            max_messages=gateway_config.get("message_cache_size", 1000) or None,
             help_command=None,
             application_id=config["application_id"],
         )
@@ -133,6 +180,34 @@ class DiscordBot(commands.Bot):
         self.logger = logger
         self.config = config
         self.database = None
+        self.http_session = None
+        self.started_at = time.monotonic()
+        self.memory_reported = False
+
+    def create_http_session(self) -> aiohttp.ClientSession:
+        """
+        Create the HTTP client shared by every cog for outbound requests.
+
+        One pooled session keeps connections alive between requests, so polling many games
+        does not pay the TCP and TLS handshakes again for every fetch. Responses are
+        negotiated as gzip/deflate, and brotli when the Brotli module is installed.
+        """
+        http_config = self.config.get("http", {})
+        connector = aiohttp.TCPConnector(
+            limit=http_config.get("pool_size", 100),
+            limit_per_host=http_config.get("pool_size_per_host", 10),
+            ttl_dns_cache=http_config.get("dns_cache_ttl", 300),
+            keepalive_timeout=http_config.get("keepalive_timeout", 60),
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=http_config.get("timeout", 30),
+            connect=http_config.get("connect_timeout", 10),
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={"User-Agent": http_config.get("user_agent", "Dom6-blitz-status-bot")},
+        )
 
     async def init_db(self) -> None:
         async with aiosqlite.connect(
@@ -194,14 +269,18 @@ class DiscordBot(commands.Bot):
             f"Running on: {platform.system()} {platform.release()} ({os.name})"
         )
         self.logger.info("-------------------")
+        self.http_session = self.create_http_session()
         await self.init_db()
-        await self.load_cogs()
-        self.status_task.start()
+        # Cogs read their state from the database when they load
         self.database = DatabaseManager(
             connection=await aiosqlite.connect(
                 f"{os.path.realpath(os.path.dirname(__file__))}/database/database.db"
-            )
+            ),
+            commit_delay=self.config.get("database", {}).get("commit_delay", 1.0),
         )
+        await self.database.setup()
+        await self.load_cogs()
+        self.status_task.start()
         
         # Sync commands for specific guilds
         try:
@@ -218,6 +297,48 @@ class DiscordBot(commands.Bot):
         except Exception as e:
             self.logger.error(f"Failed to sync commands: {e}")
 
+    async def close(self) -> None:
+        """
+        Close the shared HTTP client and the database once the bot has shut down.
+        """
+        await super().close()
+        if self.http_session is not None:
+            await self.http_session.close()
+        if self.database is not None:
+            await self.database.close()
+
+    def memory_report(self) -> str:
+        """
+        Describe what the gateway caches hold and the memory used by the bot.
+        """
+        members = sum(len(guild.members) for guild in self.guilds)
+        messages = len(self.cached_messages)
+        try:
+            import resource
+
+            # Kilobytes on Linux, bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            memory = f"{max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024):.1f} MiB peak RSS"
+        except ImportError:
+            memory = "memory usage unavailable"
+        return (
+            f"{memory}, {len(self.guilds)} guilds, {members} members and {len(self.users)} users cached, "
+            f"{messages} messages cached (max {self._connection.max_messages or 0}), "
+            f"member intent {'on' if self.intents.members else 'off'}, "
+            f"presence intent {'on' if self.intents.presences else 'off'}, "
+            f"chunking at startup {'on' if self._connection._chunk_guilds else 'off'}"
+        )
+
+    async def on_ready(self) -> None:
+        """
+        The code in this event is executed when the bot is connected and its caches are filled.
+        It may run again after a reconnect, the memory report is only logged the first time.
+        """
+        if self.memory_reported:
+            return
+        self.memory_reported = True
+        self.logger.info(f"Ready in {time.monotonic() - self.started_at:.1f}s: {self.memory_report()}")
+
     async def on_message(self, message: discord.Message) -> None:
         """
         The code in this event is executed every time someone sends a message, with or without the prefix
@@ -305,7 +426,8 @@ class DiscordBot(commands.Bot):
 
 
 
-load_dotenv()
+if __name__ == "__main__":
+    load_dotenv()
 
-bot = DiscordBot()
-bot.run(os.getenv("TOKEN"))
+    bot = DiscordBot()
+    bot.run(os.getenv("TOKEN"))
@@ -1,119 +1,327 @@
-import asyncio
-import aiohttp
 import discord
+from discord import app_commands
 from discord.ext import commands, tasks
 from discord.ext.commands import Context
-from status.capture_status import extract_status_data
+from database.filestore import FileStore
+from status.breaker import CircuitBreaker, backoff_delay
+from status.cache import SnapshotCache
+from status.capture_status import BACKENDS, DEFAULT_BACKEND
+from status.dashboard import DashboardManager
+from status.diff import DeadlineMoved, TurnAdvanced, diff_snapshots
+from status.embeds import (
+    dashboard_embed,
+    details_embed,
+    game_stats_embed,
+    player_stats_embed,
+    reminder_mentions,
+    status_embed,
+    turn_mentions,
+)
+from status.fetcher import FetchError, GameFetcher
+from status.history import history_rows
+from status.outbox import Outbox, Priority
+from status.parse_pool import ParsePool
+from status.ratelimit import RequestGovernor, RequestPriority
+from status.reminders import ReminderTimers
+from status.scheduler import PollPolicy, PollScheduler
+from status.snapshot import GameSnapshot, parse_player_id
+from status.stats import WAITING_STATES, StatsRecorder, format_duration, submit_bucket
+from status.subscriptions import Subscription, SubscriptionRegistry
 from views.PlayerSelectView import PlayerSelectView
 import os
-import json
-from datetime import datetime
 import random
+import time
+from urllib.parse import urlparse
 # Here we name the cog and create a new class for the cog.
 
 class Dominions(commands.Cog, name="dominions"):
     def __init__(self, bot) -> None:
         self.bot = bot
         self.data_folder = "data"
-        # Create data folder if it doesn't exist
-        if not os.path.exists(self.data_folder):
-            os.makedirs(self.data_folder)
-        
+        # Creates the data folder if it doesn't exist
+        self.store = FileStore(
+            self.data_folder,
+            save_delay=self.bot.config.get("persistence", {}).get("save_delay", 5),
+            logger=self.bot.logger,
+        )
+
         # Load saved data
-        self.watch_tasks = {}  # Can't load tasks directly
-        self.current_status = self.load_dict("current_status.json")
-        self.registered_players = self.load_dict("registered_players.json")
-        self.custom_turn_message_list = self.load_text_file("turn_messages.txt")
-        self.custom_reminder_message_list = self.load_text_file("reminder_messages.txt")
+        watch_config = self.bot.config.get("watch", {})
+        self.poll_interval = watch_config.get("poll_interval", 60)
+        self.poll_policy = PollPolicy.from_config(watch_config)
+        self.scheduler = PollScheduler(
+            self.poll_game,
+            workers=watch_config.get("poll_workers", 4),
+            error_delay=self.poll_interval,
+            logger=self.bot.logger,
+        )
+        outbox_config = self.bot.config.get("outbox", {})
+        self.outbox = Outbox(
+            channel_rate=outbox_config.get("channel_rate", 1),
+            channel_burst=outbox_config.get("channel_burst", 5),
+            global_rate=outbox_config.get("global_rate", 40),
+            logger=self.bot.logger,
+        )
+        self.drain_timeout = outbox_config.get("drain_timeout", 10)
+        self.dashboards = DashboardManager(
+            self.render_dashboard,
+            self.get_channel,
+            debounce=self.bot.config.get("dashboard", {}).get("debounce", 10),
+            on_change=lambda: self.store.mark_dirty("dashboards.json"),
+            logger=self.bot.logger,
+        )
+        self.reminders = ReminderTimers(
+            self.send_reminder,
+            offsets=[hours * 3600 for hours in watch_config.get("reminder_hours", [12, 3, 0.5])],
+            logger=self.bot.logger,
+        )
+        self.warmup_rate = watch_config.get("warmup_rate", 2)
+        self.warmup_jitter = watch_config.get("warmup_jitter", 5)
+        cache_config = self.bot.config.get("cache", {})
+        self.details_ttl = cache_config.get("details_ttl", 60)
+        parser_config = self.bot.config.get("parser", {})
+        parser_backend = parser_config.get("backend")
+        if parser_backend not in BACKENDS:
+            if parser_backend:
+                self.bot.logger.warning(f"Parser backend '{parser_backend}' is not available, using '{DEFAULT_BACKEND}'")
+            parser_backend = DEFAULT_BACKEND
+        base_url = self.bot.config.get("blitzserver_url", "https://beta.blitzserver.net")
+        http_config = self.bot.config.get("http", {})
+        self.fetcher = GameFetcher(
+            self.bot,
+            base_url=base_url,
+            breaker=CircuitBreaker(
+                urlparse(base_url).netloc or base_url,
+                failure_threshold=http_config.get("breaker_threshold", 5),
+                reset_timeout=http_config.get("breaker_reset", 30),
+                max_reset_timeout=http_config.get("breaker_max_reset", 300),
+                logger=self.bot.logger,
+            ),
+            governor=RequestGovernor(
+                http_config.get("request_rate", 5),
+                http_config.get("request_burst", 10),
+                reserve=http_config.get("command_reserve", 3),
+            ),
+            command_wait=http_config.get("command_wait", 10),
+            streaming=parser_config.get("streaming", True),
+            stream_tail=parser_config.get("stream_tail", 0),
+            retries=http_config.get("retries", 2),
+            retry_base=http_config.get("retry_base", 1),
+            retry_cap=http_config.get("retry_cap", 10),
+            parse_pool=ParsePool(
+                mode=parser_config.get("pool_mode", "thread"),
+                workers=parser_config.get("pool_size"),
+                max_pending=parser_config.get("max_pending", 64),
+                backend=parser_backend,
+                logger=self.bot.logger,
+            ),
+            cache=SnapshotCache(
+                max_entries=cache_config.get("max_games", 1024),
+                ttl=self.details_ttl,
+                negative_ttl=cache_config.get("negative_ttl", 300),
+            ),
+        )
+        cooldown_config = self.bot.config.get("cooldowns", {})
+        user_uses, user_per = cooldown_config.get("details_user", [3, 30])
+        guild_uses, guild_per = cooldown_config.get("details_guild", [10, 60])
+        self.details_cooldowns = (
+            commands.CooldownMapping.from_cooldown(user_uses, user_per, commands.BucketType.user),
+            commands.CooldownMapping.from_cooldown(guild_uses, guild_per, commands.BucketType.guild),
+        )
+        self.subscriptions = SubscriptionRegistry.from_dict(self.store.load("watches.json"))
+        self.channels = {}  # Channels of the subscriptions by ID, resolved on first use
+        self.dashboards.load(self.store.load("dashboards.json"))
+        self.seen_digests = {}
+        self.last_change_time = {}
+        self.turn_deadlines = {}  # The status and last known deadline of the current turn by game ID
+        self.fetch_failures = {}  # Consecutive failed polls by game ID
+        self.stats_recorder = StatsRecorder(self.bot.database)
+        self.current_status = {}  # Latest snapshot of every watched game, loaded from the database in cog_load
+        self.custom_turn_message_list = self.store.load("turn_messages.txt")
+        self.custom_reminder_message_list = self.store.load("reminder_messages.txt")
 
         # Set default messages if empty
         if not self.custom_turn_message_list:
             self.custom_turn_message_list = ["Turn has changed!"]
 
         if not self.custom_reminder_message_list:
-            self.custom_reminder_message_list = ["Reminder: Less than 12 hours remaining for turn!"]
-        
-        self.reminder_hrs = 12
+            self.custom_reminder_message_list = ["Reminder: The turn is ending soon!"]
+
+        self.store.register("watches.json", self.subscriptions.to_dict)
+        self.store.register("dashboards.json", self.dashboards.to_dict)
+        self.store.register("turn_messages.txt", lambda: list(self.custom_turn_message_list))
+        self.store.register("reminder_messages.txt", lambda: list(self.custom_reminder_message_list))
         # Start auto-save task
         self.auto_save.start()
 
-    def save_dict(self, data: dict, filename: str) -> None:
-        """Save dictionary to a JSON file."""
-        filepath = os.path.join(self.data_folder, filename)
-        try:
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=4)
-        except Exception as e:
-            print(f"Error saving {filename}: {str(e)}")
-
-    def load_dict(self, filename: str) -> dict:
-        """Load dictionary from a JSON file."""
-        filepath = os.path.join(self.data_folder, filename)
-        try:
-            with open(filepath, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
-        except json.JSONDecodeError:
-            print(f"Error decoding {filename}, starting with empty dict")
-            return {}
-    
-    def load_text_file(self, filename: str) -> dict:
-        """Load lines from a Text file."""
-        filepath = os.path.join(self.data_folder, filename)
-        try:
-            with open(filepath, 'r') as f:
-                return [line.strip() for line in f.readlines() if line.strip()]
-        except FileNotFoundError:
-            return []
-    
-    def save_text_file(self, data: list, filename: str) -> None:
-        """Save lines to a Text file."""
-        filepath = os.path.join(self.data_folder, filename)
-        try:
-            with open(filepath, 'w') as f:
-                for line in data:
-                    f.write(f"{line}\n")
-        except Exception as e:
-            print(f"Error saving {filename}: {str(e)}")
-
-    def save_all_data(self):
-        """Save all dictionaries to disk."""
-        # Don't save watch_tasks as they can't be serialized
-        self.save_dict(self.current_status, "current_status.json")
-        self.save_dict(self.registered_players, "registered_players.json")
-        self.save_text_file(self.custom_turn_message_list, "turn_messages.txt")
-        self.save_text_file(self.custom_reminder_message_list, "reminder_messages.txt")
-        print(f"Data auto-saved at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    async def save_all_data(self) -> None:
+        """
+        Save the data files that changed. Game statuses and registrations are written to the
+        database as they change.
+        """
+        await self.store.save()
 
     @tasks.loop(minutes=5)
     async def auto_save(self):
-        """Auto-save task that runs every 5 minutes."""
-        self.save_all_data()
+        """Auto-save task that runs every 5 minutes, in case a change was not marked."""
+        await self.save_all_data()
+
+    async def cog_load(self):
+        """Called when the cog is loaded."""
+        await self.migrate_json_state()
+        if await self.bot.database.backfill_submission_histogram(submit_bucket):
+            self.bot.logger.info("Built the submission time histograms from the recorded submissions")
+        self.current_status = {
+            game_id: GameSnapshot.from_dict(game_id, data)
+            for game_id, data in (await self.bot.database.get_game_statuses(self.subscriptions)).items()
+        }
+        for game_id, snapshot in self.current_status.items():
+            if snapshot.deadline is not None:
+                # Whether the reminders due while the bot was down were sent is unknown, so don't repeat them
+                self.reminders.arm(game_id, snapshot.deadline, catch_up=False)
+        self.reminders.start()
+        self.scheduler.start()
+        self.restore_watches()
+
+    async def migrate_json_state(self) -> None:
+        """
+        Import current_status.json and registered_players.json into the database, once. The
+        files are renamed with a .migrated suffix afterwards.
+        """
+        files = ("current_status.json", "registered_players.json")
+        if not any(os.path.exists(os.path.join(self.data_folder, filename)) for filename in files):
+            return
+        registered_players = {
+            game_id: {
+                nation: player_id
+                for nation, player_id in ((nation, parse_player_id(value)) for nation, value in players.items())
+                if player_id is not None
+            }
+            for game_id, players in self.store.load("registered_players.json").items()
+        }
+        game_statuses = {
+            game_id: GameSnapshot.from_dict(game_id, data).to_dict()
+            for game_id, data in self.store.load("current_status.json").items()
+        }
+        await self.bot.database.import_json_state(registered_players, game_statuses)
+        for filename in files:
+            filepath = os.path.join(self.data_folder, filename)
+            if os.path.exists(filepath):
+                os.replace(filepath, f"{filepath}.migrated")
+        self.bot.logger.info(
+            f"Migrated {sum(len(players) for players in registered_players.values())} registrations "
+            f"and {len(game_statuses)} game statuses from JSON to the database"
+        )
 
-    def cog_unload(self):
+    async def cog_unload(self):
         """Called when the cog is unloaded."""
         self.auto_save.cancel()
-        self.save_all_data()  # Save one last time when unloading
+        await self.scheduler.stop()
+        await self.reminders.stop()
+        await self.outbox.close(timeout=self.drain_timeout)
+        await self.dashboards.close()
+        self.fetcher.parse_pool.shutdown()
+        await self.bot.database.flush()
+        await self.store.close()  # Save one last time when unloading
+
+    def restore_watches(self) -> None:
+        """Resume the saved watches, polling the games closest to their deadline first."""
+        def urgency(game_id):
+            snapshot = self.current_status.get(game_id)
+            deadline = snapshot.deadline if snapshot is not None else None
+            return deadline if deadline is not None else float("inf")
+
+        restored = self.scheduler.add_staggered(
+            sorted(self.subscriptions, key=urgency),
+            rate=self.warmup_rate,
+            jitter=self.warmup_jitter,
+        )
+        if restored:
+            self.bot.logger.info(
+                f"Restored {restored} watched games, warming up over {restored / max(self.warmup_rate, 0.001):.0f}s"
+            )
 
-    # Add this helper function at the class level
-    def parse_time_string(self, time_str:str):
-        """Parse time string and return total hours as float."""
-        if "submission" in time_str.lower() or "hours" not in time_str.lower():
-            return 0
-        
-        total_hours = 0
-        parts = time_str.lower().split(", ")
-        for part in parts:
-            value = float(part.split()[0])
-            unit = part.split()[1]
-            if "hour" in unit:
-                total_hours += value
-            elif "minute" in unit:
-                total_hours += value / 60
-            elif "day" in unit:
-                total_hours += value * 24
-        return total_hours
+    async def resolve_channel(self, game_id: str, subscription: Subscription):
+        """
+        Return the channel of a subscription, fetching it from Discord if it is not cached.
+        A subscription whose channel was deleted or is no longer visible is removed.
+
+        :param game_id: The ID of the Dominions game.
+        :param subscription: The subscription of the channel to the game.
+        :return: The channel, or None if it is gone.
+        """
+        channel = await self.get_channel(subscription.channel_id)
+        if channel is None:
+            self.bot.logger.warning(f"Channel {subscription.channel_id} of game {game_id} is gone, unsubscribed it")
+            self.unsubscribe(game_id, subscription.channel_id)
+        return channel
+
+    async def get_channel(self, channel_id: int):
+        """
+        Return a channel by ID from the cache of the cog or of the bot, fetching it from Discord otherwise.
+
+        :param channel_id: The ID of the channel.
+        :return: The channel, or None if it was deleted or is no longer visible to the bot.
+        """
+        channel = self.channels.get(channel_id)
+        if channel is not None:
+            return channel
+        await self.bot.wait_until_ready()
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            try:
+                channel = await self.bot.fetch_channel(channel_id)
+            except (discord.NotFound, discord.Forbidden):
+                return None
+        self.channels[channel_id] = channel
+        return channel
+
+    async def broadcast(
+        self,
+        game_id: str,
+        content: str,
+        *,
+        embed=None,
+        mentions: str = None,
+        priority: Priority = Priority.INFO,
+        coalesce: bool = False,
+    ) -> int:
+        """
+        Queue a message for every channel subscribed to a game. The same embed is sent to all of them.
+
+        :param game_id: The ID of the Dominions game.
+        :param content: The text of the message.
+        :param embed: The embed attached to the message.
+        :param mentions: The mentions appended to the text for subscriptions with mentions enabled.
+        :param priority: The outbox priority of the message. Reminders are skipped by subscriptions with reminders disabled.
+        :param coalesce: Whether the message may be merged with an update of the game still waiting in the outbox.
+        :return: The number of channels the message was queued for.
+        """
+        queued = 0
+        for subscription in self.subscriptions.for_game(game_id):
+            if priority is Priority.REMINDER and not subscription.reminders:
+                continue
+            channel = await self.resolve_channel(game_id, subscription)
+            if channel is None:
+                continue
+            text = f"{content} {mentions}" if mentions and subscription.mentions else content
+            if self.outbox.send(channel, text, embed=embed, priority=priority, key=game_id if coalesce else None):
+                queued += 1
+        return queued
+
+    def check_details_cooldown(self, context: Context) -> bool:
+        """
+        Limit how often a user and a guild can use /details, raising CommandOnCooldown so the
+        bot's error handler tells the user when to try again.
+
+        :param context: The context of the command.
+        """
+        for mapping in self.details_cooldowns:
+            bucket = mapping.get_bucket(context.message)
+            retry_after = bucket.update_rate_limit()
+            if retry_after:
+                raise commands.CommandOnCooldown(bucket, retry_after, mapping.type)
+        return True
 
     # Here you can just add your own commands, you'll always need to provide "self" as first parameter.
 
@@ -121,76 +329,56 @@ class Dominions(commands.Cog, name="dominions"):
         name="details",
         description="Fetches the status of a Dominions game by ID.",
     )
-    async def details(self, context: Context, game_id: str) -> None:
+    @app_commands.describe(
+        game_id="The ID of the Dominions game.",
+        refresh="Fetch the game from the server even if it was fetched recently.",
+    )
+    @commands.check(lambda context: context.cog.check_details_cooldown(context))
+    async def details(self, context: Context, game_id: str, refresh: bool = False) -> None:
         """
         Fetches the status of a Dominions game by ID.
 
         :param context: The application command context.
         :param game_id: The ID of the Dominions game.
+        :param refresh: Whether to skip the snapshot cache.
         """
-        async with aiohttp.ClientSession() as session:
-            url = f"https://beta.blitzserver.net/game/{game_id}#status"
-            async with session.get(url) as request:
-                if request.status == 200:
-                    data = await request.text()
-                    lobby_name, players_data, game_info = extract_status_data(data)
-                    
-                    embed = discord.Embed(title=f'Lobby: {lobby_name}', color=0xD75BF4)
-                    if 'status' in game_info:
-                        embed.add_field(name="Game Status", value=game_info['status'], inline=False)
-                    if 'address' in game_info:
-                        embed.add_field(name="Game Address", value=game_info['address'], inline=False)
-                    if 'next_turn' in game_info:
-                        embed.add_field(name="Next Turn", value=game_info['next_turn'], inline=False)
-                    
-                    status_emojis = {
-                        "submitted": ":ballot_box_with_check:",
-                        "unsubmitted": ":x:",
-                        "computer": ":desktop:",
-                        "unfinished": ":warning:",
-                        "dead": ":headstone:",
-                        "Unknown": ":question:",
-                        "remove pretender": ":skull:"
-                    }
-                    
-                    # Count players by status
-                    status_counts = {
-                        "submitted": 0,
-                        "unsubmitted": 0,
-                        "computer": 0,
-                        "unfinished": 0,
-                        "dead": 0
-                    }
-
-                    # Create player list excluding computer and dead nations
-                    player_list = []
-                    for player in players_data:
-                        status = player.get('status', 'Unknown').lower()
-                        status_counts[status] = status_counts.get(status, 0) + 1
-                        
-                        # Only add to player list if not computer or dead
-                        if status not in ['computer', 'dead']:
-                            nation_name = player.get('nation_name', 'Unknown')
-                            player_mention = self.registered_players.get(game_id, {}).get(nation_name, '')
-                            player_list.append(f"{status_emojis.get(status, ':question:')} {nation_name} {player_mention}")
-
-                    # Create status summary
-                    status_summary = []
-                    for status, count in status_counts.items():
-                        if count > 0:
-                            status_summary.append(f"{status_emojis[status]} {count}")
-                    
-                    embed.add_field(name="**Status Summary**", value=" | ".join(status_summary), inline=False)
-                    
-                    if player_list:
-                        embed.add_field(name="**Active Players**", value="\n".join(player_list), inline=False)
-                else:
-                    embed = discord.Embed(
-                        title="Error!",
-                        description="There is something wrong with the API, please try again later",
-                        color=0xE02B2B,
-                    )
-                await context.send(embed=embed)
+        # Waiting for the request budget and retries can take longer than the 3s Discord gives to answer
+        await context.defer()
+        result = await self.fetcher.fetch(
+            game_id, max_age=None if refresh else self.details_ttl, priority=RequestPriority.COMMAND
+        )
+        if result.error is FetchError.BUSY:
+            # Out of request budget, the last page fetched is better than nothing
+            result = self.fetcher.cached(game_id) or result
+        if result.ok:
+            embed = details_embed(result.snapshot, await self.bot.database.get_registered_players(game_id))
+            if result.source == "cache":
+                embed.set_footer(text=f"Fetched {round(time.monotonic() - result.fetched_at)}s ago")
+        elif result.error is FetchError.NOT_FOUND:
+            embed = discord.Embed(
+                title="Error!",
+                description=f"Game {game_id} was not found on the server.",
+                color=0xE02B2B,
+            )
+        elif result.error is FetchError.BUSY:
+            embed = discord.Embed(
+                title="Error!",
+                description="Too many games are being fetched right now, please try again in a moment.",
+                color=0xE02B2B,
+            )
+        elif result.error is FetchError.CIRCUIT_OPEN:
+            embed = discord.Embed(
+                title="Error!",
+                description=f"The server is not responding, please try again in {format_duration(self.fetcher.breaker.retry_in())}.",
+                color=0xE02B2B,
+            )
+        else:
+            embed = discord.Embed(
+                title="Error!",
+                description="There is something wrong with the API, please try again later",
+                color=0xE02B2B,
+            )
+        await context.send(embed=embed)
 
 
 
@@ -222,8 +410,7 @@ class Dominions(commands.Cog, name="dominions"):
             view = PlayerSelectView(
                 self.bot,
                 self.game_id.value,
-                self.nation_name.value,
-                interaction.guild
+                self.nation_name.value
             )
             await interaction.response.send_message(
                 "Please select the player:",
@@ -248,106 +435,232 @@ class Dominions(commands.Cog, name="dominions"):
             # For text command, send a message directing users to use slash command
             await context.send("Please use the slash command `/register` to open the registration form.")
 
+    async def poll_game(self, game_id: str):
+        """
+        Poll a watched game once and notify its subscribed channels of turn changes and reminders.
+
+        :param game_id: The ID of the Dominions game.
+        :return: The delay in seconds until the next poll, or None to stop watching the game.
+        """
+        if game_id not in self.subscriptions:
+            return None
+
+        result = await self.fetcher.fetch(game_id)
+        if game_id not in self.subscriptions:
+            # Unwatched while the page was fetched, its state is already forgotten
+            return None
+        if not result.ok:
+            return await self.poll_failed(game_id, result)
+        if self.fetch_failures.pop(game_id, None):
+            self.bot.logger.info(f"Game {game_id} is reachable again")
+        if self.seen_digests.get(game_id) == result.digest and game_id in self.current_status:
+            # Same page as the previous poll, only the countdown text may have moved on
+            self.current_status[game_id] = result.snapshot
+            return self.next_poll_delay(game_id)
+
+        snapshot = result.snapshot
+        new_status = snapshot.status or 'Unknown'
+        history = history_rows(self.current_status.get(game_id), snapshot)
+        if history:
+            await self.bot.database.add_history(history)
+            if game_id not in self.subscriptions:
+                return None
+        self.seen_digests[game_id] = result.digest
+
+        # Check game status
+        if new_status == 'Unknown' or snapshot.is_won:
+            await self.broadcast(game_id, f"Stopped watching game {game_id} due to game status: {new_status}.")
+            self.stop_watching(game_id)
+            return None
+
+        # Process status changes. The game state and the reminders are updated before the next
+        # await, so that an unwatch cannot run in between and have them written back afterwards.
+        previous = self.current_status.get(game_id)
+        events = diff_snapshots(previous, snapshot)
+        self.current_status[game_id] = snapshot
+        status_changed = any(isinstance(event, TurnAdvanced) for event in events)
+        if status_changed:
+            self.last_change_time[game_id] = time.time()
+        for event in events:
+            self.bot.logger.debug(f"Game {game_id}: {event}")
+            if isinstance(event, DeadlineMoved) and not status_changed:
+                # Reminders are timers on the deadline, so they only need re-arming when it moves
+                if event.deadline is None:
+                    self.bot.logger.info(f"Game {game_id} no longer has a deadline, disarming its reminders")
+                    self.reminders.disarm(game_id)
+                else:
+                    change = "extended" if event.extended else "shortened"
+                    self.bot.logger.info(f"Deadline of game {game_id} was {change}, re-arming its reminders")
+                    self.reminders.arm(game_id, event.deadline)
+        if status_changed:
+            self.reminders.new_turn(game_id, snapshot.deadline)
+        elif game_id not in self.reminders and snapshot.deadline is not None:
+            # Newly watched, remind right away if the turn is already close to its end
+            self.reminders.arm(game_id, snapshot.deadline, catch_up=previous is None)
+        if events or previous is None:
+            # The deadline is stored as observed_at plus the time left, so only changes need writing
+            await self.bot.database.save_game_status(game_id, snapshot.to_dict(), snapshot.status, snapshot.observed_at)
+            for subscription in self.subscriptions.for_game(game_id):
+                self.dashboards.touch(subscription.channel_id)
+        if events:
+            await self.stats_recorder.record(previous, snapshot, events)
+
+        if status_changed:
+            # Send status update
+            embed = status_embed(snapshot)
+            mentions = turn_mentions(await self.bot.database.get_registered_players(game_id))
+            message = random.choice(self.custom_turn_message_list) if self.custom_turn_message_list else "Turn has changed!"
+            await self.broadcast(game_id, message, embed=embed, mentions=mentions, priority=Priority.TURN, coalesce=True)
+
+        return self.next_poll_delay(game_id)
+
+    async def send_reminder(self, game_id: str, offset: float) -> None:
+        """
+        Remind the players who haven't submitted their turn yet that the deadline is close.
+        Called by the reminder timers at each configured offset before the deadline.
+
+        :param game_id: The ID of the Dominions game.
+        :param offset: The seconds before the deadline the reminder was scheduled at.
+        """
+        snapshot = self.current_status.get(game_id)
+        if snapshot is None or game_id not in self.subscriptions:
+            return
+        if not any(nation.state in WAITING_STATES for nation in snapshot.nations):
+            # Everyone is done, the turn will process on its own
+            return
+        remaining = snapshot.deadline - time.time() if snapshot.deadline is not None else offset
+        mentions = reminder_mentions(snapshot, await self.bot.database.get_registered_players(game_id))
+        message = random.choice(self.custom_reminder_message_list) if self.custom_reminder_message_list else "Reminder: The turn is ending soon!"
+        await self.broadcast(
+            game_id,
+            f"{message} ({format_duration(max(remaining, 0))} left)",
+            embed=status_embed(snapshot),
+            mentions=mentions,
+            priority=Priority.REMINDER,
+            coalesce=True,
+        )
+
+    async def poll_failed(self, game_id: str, result) -> float:
+        """
+        Handle a failed poll of a game. Games the server doesn't know are no longer watched,
+        other failures are retried with a growing delay, and every game waits for the circuit
+        breaker while the server is down. Polls left without request budget are retried soon.
+
+        :param game_id: The ID of the Dominions game.
+        :param result: The failed FetchResult.
+        :return: The delay in seconds until the next poll, or None to stop watching the game.
+        """
+        if not result.error.transient:
+            reason = "the game was not found" if result.error is FetchError.NOT_FOUND else f"request error {result.status}"
+            await self.broadcast(game_id, f"Stopped watching game {game_id}: {reason}.")
+            self.stop_watching(game_id)
+            return None
+        if result.error is FetchError.CIRCUIT_OPEN:
+            # Paused with every other game, spread out so they don't all come back at once
+            return self.fetcher.breaker.retry_in() + random.uniform(1, 1 + self.warmup_jitter)
+        if result.error is FetchError.BUSY:
+            # Out of request budget, which says nothing about the game or the server
+            return self.poll_policy.min_interval
+        failures = self.fetch_failures.get(game_id, 0) + 1
+        self.fetch_failures[game_id] = failures
+        delay = backoff_delay(failures, base=self.poll_policy.min_interval, cap=self.poll_policy.max_interval)
+        self.bot.logger.warning(
+            f"Polling game {game_id} failed ({result.error.value}, status {result.status}), "
+            f"retrying in {delay:.0f}s (attempt {failures})"
+        )
+        return delay
+
+    def next_poll_delay(self, game_id: str) -> float:
+        """
+        Return the delay until the next poll of a game from its deadline and last status change.
+        The countdown reads zero or disappears while the turn is processed, so the last known
+        deadline of the turn is kept until the status changes and the game is polled at the
+        minimum interval past it.
+
+        :param game_id: The ID of the Dominions game.
+        """
+        snapshot = self.current_status.get(game_id)
+        deadline = snapshot.deadline if snapshot is not None else None
+        if deadline is not None:
+            self.turn_deadlines[game_id] = (snapshot.status, deadline)
+        elif snapshot is not None:
+            status, last_deadline = self.turn_deadlines.get(game_id, (None, None))
+            if status == snapshot.status:
+                deadline = last_deadline
+            else:
+                self.turn_deadlines.pop(game_id, None)
+        return self.poll_policy.delay(deadline, self.last_change_time.get(game_id))
+
+    def stop_watching(self, game_id: str) -> bool:
+        """
+        Unsubscribe every channel from a game, remove it from the poll scheduler and forget its state.
+
+        :param game_id: The ID of the Dominions game.
+        :return: False if the game was not watched.
+        """
+        removed = self.subscriptions.remove_game(game_id)
+        if removed:
+            self.store.mark_dirty("watches.json")
+        for subscription in removed:
+            self.dashboards.touch(subscription.channel_id)
+        if self.current_status.pop(game_id, None) is not None:
+            self.bot.database.defer(self.bot.database.delete_game_status(game_id))
+        self.reminders.disarm(game_id)
+        self.fetcher.forget(game_id)
+        self.seen_digests.pop(game_id, None)
+        self.last_change_time.pop(game_id, None)
+        self.turn_deadlines.pop(game_id, None)
+        self.fetch_failures.pop(game_id, None)
+        return self.scheduler.remove(game_id)
+
+    def unsubscribe(self, game_id: str, channel_id: int) -> bool:
+        """
+        Unsubscribe a channel from a game, and stop watching the game if no channel is left.
+
+        :param game_id: The ID of the Dominions game.
+        :param channel_id: The ID of the channel.
+        :return: False if the channel was not subscribed to the game.
+        """
+        if not self.subscriptions.unsubscribe(game_id, channel_id):
+            return False
+        if game_id not in self.subscriptions:
+            self.stop_watching(game_id)
+        self.store.mark_dirty("watches.json")
+        return True
+
     @commands.hybrid_command(
         name="watch",
         description="Watches the status of a Dominions game by ID.",
     )
-    async def watch(self, context: Context, game_id: str) -> None:
+    @app_commands.describe(
+        game_id="The ID of the Dominions game.",
+        mentions="Mention the registered players in the updates sent to this channel.",
+        reminders="Send reminders before the turn deadline to this channel.",
+    )
+    async def watch(self, context: Context, game_id: str, mentions: bool = True, reminders: bool = True) -> None:
         """
-        Watches the status of a Dominions game by ID.
+        Watches the status of a Dominions game by ID in the current channel.
 
         :param context: The application command context.
         :param game_id: The ID of the Dominions game.
+        :param mentions: Whether to mention the registered players in this channel.
+        :param reminders: Whether to send reminders to this channel.
         """
-        if game_id in self.watch_tasks:
-            await context.send(f"Already watching game {game_id}.")
-            return
-
-        async def watch_task():
-            async with aiohttp.ClientSession() as session:
-                url = f"https://beta.blitzserver.net/game/{game_id}#status"
-                last_reminder_time = None
-                while True:
-                    async with session.get(url) as request:
-                        if request.status != 200:
-                            await context.send(f"Stopped watching game {game_id} due to request error.")
-                            self.watch_tasks.pop(game_id, None)
-                            self.current_status.pop(game_id, None)
-                            break
-                        data = await request.text()
-                        lobby_name, players_data, game_info = extract_status_data(data)
-                        new_status = game_info.get('status', 'Unknown')
-                        next_turn = game_info.get('next_turn', '')
-
-                        # Check game status
-                        if new_status == 'Unknown' or 'Won' in new_status:
-                            await context.send(f"Stopped watching game {game_id} due to game status: {new_status}.")
-                            self.watch_tasks.pop(game_id, None)
-                            self.current_status.pop(game_id, None)
-                            break
-
-                        # Process status changes
-                        status_changed = False
-                        if game_id not in self.current_status:
-                            self.current_status[game_id] = {'status': new_status, 'next_turn': next_turn}
-                            #status_changed = True
-                        elif new_status != self.current_status[game_id]['status']:
-                            self.current_status[game_id]['status'] = new_status
-                            self.current_status[game_id]['next_turn'] = next_turn
-                            status_changed = True
-
-                        # Send either status update or reminder, not both
-                        if status_changed:
-                            # Send status update
-                            embed = discord.Embed(title=f'Lobby: {lobby_name}', color=0xD75BF4)
-                            embed.add_field(name="Game Status", value=new_status, inline=False)
-                            if 'address' in game_info:
-                                embed.add_field(name="Game Address", value=game_info['address'], inline=False)
-                            if 'next_turn' in game_info:
-                                embed.add_field(name="Next Turn", value=game_info['next_turn'], inline=False)
-                        
-                            mentions = " ".join([mention for nation, mention in self.registered_players.get(game_id, {}).items()])
-                            if not mentions:
-                                mentions = "@here"
-                            message = random.choice(self.custom_turn_message_list) if self.custom_turn_message_list else "Turn has changed!"
-                            last_reminder_time = None
-                            await context.send(content=f"{message} {mentions}", embed=embed)
-
-                        elif next_turn and not last_reminder_time:  # Only check reminder if status hasn't changed
-                            hours_remaining = self.parse_time_string(next_turn)
-
-                            if hours_remaining < self.reminder_hrs and hours_remaining > 0:
-                                # Send reminder for unsubmitted players
-                                mentions = ""
-                                for player in players_data:
-                                    if player.get('status', '').lower() == 'unsubmitted':
-                                        nation_name = player.get('nation_name', '')
-                                        player_mention = self.registered_players.get(game_id, {}).get(nation_name, '')
-                                        if player_mention:
-                                            mentions = mentions + player_mention
-
-                                if not mentions:
-                                    mentions = "@here"
-
-                                # Send status update
-                                embed = discord.Embed(title=f'Lobby: {lobby_name}', color=0xD75BF4)
-                                embed.add_field(name="Game Status", value=new_status, inline=False)
-                                if 'address' in game_info:
-                                    embed.add_field(name="Game Address", value=game_info['address'], inline=False)
-                                if 'next_turn' in game_info:
-                                    embed.add_field(name="Next Turn", value=game_info['next_turn'], inline=False)
-
-                                message = random.choice(self.custom_reminder_message_list) if self.custom_reminder_message_list else "Reminder: Less than 12 hours remaining for turn!"
-                                reminder_msg = f"{message} {mentions}"
-                                await context.send(content=reminder_msg, embed=embed)
-                                last_reminder_time = datetime.now()
-
-
-                    await asyncio.sleep(60) # Recommended to sleep for a minute to avoid rate limiting
-
-        task = self.bot.loop.create_task(watch_task())
-        self.watch_tasks[game_id] = task
-        await context.send(f"Started watching game {game_id}.")
+        subscription = Subscription(
+            context.channel.id,
+            guild_id=context.guild.id if context.guild else None,
+            mentions=mentions,
+            reminders=reminders,
+        )
+        is_new = self.subscriptions.subscribe(game_id, subscription)
+        self.store.mark_dirty("watches.json")
+        self.channels[context.channel.id] = context.channel
+        self.scheduler.add(game_id)
+        self.dashboards.touch(context.channel.id)
+        if is_new:
+            await context.send(f"Started watching game {game_id}.")
+        else:
+            await context.send(f"Updated the watch settings of game {game_id} in this channel.")
 
     @commands.hybrid_command(
         name="unwatch",
@@ -355,18 +668,16 @@ class Dominions(commands.Cog, name="dominions"):
     )
     async def unwatch(self, context: Context, game_id: str) -> None:
         """
-        Stops watching the status of a Dominions game by ID.
+        Stops watching the status of a Dominions game by ID in the current channel.
 
         :param context: The application command context.
         :param game_id: The ID of the Dominions game.
         """
-        task = self.watch_tasks.pop(game_id, None)
-        if task:
-            task.cancel()
-            self.current_status.pop(game_id, None)
+        if self.unsubscribe(game_id, context.channel.id):
+            self.dashboards.touch(context.channel.id)
             await context.send(f"Stopped watching game {game_id}.")
         else:
-            await context.send(f"Not watching game {game_id}.")
+            await context.send(f"Not watching game {game_id} in this channel.")
         
     @commands.hybrid_command(
     name="add_turn_message",
@@ -381,6 +692,7 @@ class Dominions(commands.Cog, name="dominions"):
         :param message: The custom turn message.
         """
         self.custom_turn_message_list.append(message)
+        self.store.mark_dirty("turn_messages.txt")
         await context.send(f"Added to Custom turn messages List: {message}")
 
     @commands.hybrid_command(
@@ -395,6 +707,7 @@ class Dominions(commands.Cog, name="dominions"):
         :param message: The custom reminder message.
         """
         self.custom_reminder_message_list.append(message)
+        self.store.mark_dirty("reminder_messages.txt")
         await context.send(f"Added to Custom reminder messages List: {message}")
 
     @commands.hybrid_command(
@@ -407,14 +720,182 @@ class Dominions(commands.Cog, name="dominions"):
 
         :param context: The application command context.
         """
-        if not self.watch_tasks:
+        if not len(self.subscriptions):
             await context.send("No games are currently being watched.")
             return
 
+        lines = []
+        for game_id in sorted(self.subscriptions):
+            subscribers = self.subscriptions.for_game(game_id)
+            here = " (this channel)" if self.subscriptions.get(game_id, context.channel.id) else ""
+            lines.append(f"• Game ID: {game_id}, {len(subscribers)} channel{'s' if len(subscribers) != 1 else ''}{here}")
         embed = discord.Embed(
             title="Currently Watched Games",
             color=0xD75BF4,
-            description="\n".join([f"• Game ID: {game_id}" for game_id in self.watch_tasks.keys()])
+            description="\n".join(lines)
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="stats",
+        description="Shows how fast the nations of a game or a player submit their turns.",
+    )
+    @app_commands.describe(
+        game_id="The ID of the Dominions game.",
+        player="The player to show, defaults to you if no game is given.",
+    )
+    async def stats(self, context: Context, game_id: str = None, player: discord.Member = None) -> None:
+        """
+        Shows the median and p90 time to submit, the number of turns a nation was last to
+        submit or went AI, and the average turn duration of a game or a player.
+
+        :param context: The application command context.
+        :param game_id: The ID of the Dominions game.
+        :param player: The player to show.
+        """
+        if game_id is not None and player is None:
+            snapshot = self.current_status.get(game_id)
+            embed = game_stats_embed(
+                game_id,
+                snapshot.lobby_name if snapshot is not None else None,
+                await self.bot.database.get_game_stats(game_id),
+                await self.bot.database.get_nation_stats(game_id),
+            )
+        else:
+            player = player or context.author
+            player_stats = await self.bot.database.get_player_stats(player.id)
+            if game_id is not None:
+                player_stats = [row for row in player_stats if row[0] == game_id]
+            embed = player_stats_embed(player, player_stats)
+        await context.send(embed=embed)
+
+    def render_dashboard(self, channel_id: int) -> discord.Embed:
+        """
+        Build the dashboard of a channel from the latest snapshots of its watched games.
+
+        :param channel_id: The ID of the channel.
+        """
+        return dashboard_embed(
+            {game_id: self.current_status.get(game_id) for game_id in self.subscriptions.for_channel(channel_id)}
+        )
+
+    @commands.hybrid_command(
+        name="dashboard",
+        description="Posts a message listing the games watched in this channel, kept up to date.",
+    )
+    async def dashboard(self, context: Context) -> None:
+        """
+        Posts the dashboard of the current channel. It is edited in place when its games change,
+        and replaces the previous dashboard of the channel.
+
+        :param context: The application command context.
+        """
+        channel = context.channel
+        message = await channel.send(embed=self.render_dashboard(channel.id))
+        self.channels[channel.id] = channel
+        previous = self.dashboards.attach(channel.id, message.id)
+        if previous is not None:
+            try:
+                await channel.get_partial_message(previous).delete()
+            except discord.HTTPException:
+                pass
+        await context.send("Dashboard posted, it will be updated as the watched games change.", ephemeral=True)
+
+    @commands.hybrid_command(
+        name="poll_stats",
+        description="Shows the state of the game poll scheduler.",
+    )
+    async def poll_stats(self, context: Context) -> None:
+        """
+        Shows the queue depth, lag and throughput of the game poll scheduler.
+
+        :param context: The application command context.
+        """
+        stats = self.scheduler.stats()
+        next_due = "-" if stats["next_due_in"] is None else f"{stats['next_due_in']:.1f}s"
+        embed = discord.Embed(title="Poll Scheduler", color=0xD75BF4)
+        embed.add_field(name="Watched Games", value=f"{stats['watched']} ({self.subscriptions.subscriber_count()} channels)", inline=True)
+        embed.add_field(name="In Flight", value=stats["in_flight"], inline=True)
+        embed.add_field(name="Queue Depth", value=stats["queue_depth"], inline=True)
+        embed.add_field(name="Next Poll In", value=next_due, inline=True)
+        embed.add_field(name="Lag (last / max)", value=f"{stats['last_lag']:.2f}s / {stats['max_lag']:.2f}s", inline=True)
+        embed.add_field(name="Polls (errors)", value=f"{stats['polls']} ({stats['errors']})", inline=True)
+        fetch_stats = self.fetcher.stats()
+        embed.add_field(
+            name="Parse Skipped",
+            value=f"{fetch_stats['hit_rate']:.0%} of {fetch_stats['requests']} fetches "
+            f"(304: {fetch_stats['not_modified']}, same hash: {fetch_stats['unchanged']}, parsed: {fetch_stats['parsed']}, "
+            f"shared: {fetch_stats['coalesced']})",
+            inline=False,
+        )
+        embed.add_field(
+            name="Streaming",
+            value=f"{fetch_stats['streamed']} pages cut short, {fetch_stats['closed_early']} connections closed early, "
+            f"{fetch_stats['bytes_read'] / 1024:.0f} KiB downloaded, {fetch_stats['bytes_not_downloaded'] / 1024:.0f} KiB not downloaded, "
+            f"{fetch_stats['bytes_parsed'] / 1024:.0f} KiB parsed, {fetch_stats['bytes_not_parsed'] / 1024:.0f} KiB downloaded but not parsed",
+            inline=False,
+        )
+        breaker_stats = self.fetcher.breaker.stats()
+        errors = ", ".join(f"{error}: {count}" for error, count in fetch_stats["errors"].items()) or "none"
+        embed.add_field(
+            name="Server Health",
+            value=f"Circuit {breaker_stats['state']}"
+            + (f" for {breaker_stats['retry_in']:.0f}s" if breaker_stats["retry_in"] else "")
+            + f", tripped {breaker_stats['trips']} times, {fetch_stats['retried']} retries, "
+            f"{len(self.fetch_failures)} games backing off, errors: {errors}",
+            inline=False,
+        )
+        governor_stats = self.fetcher.governor.stats()
+        embed.add_field(
+            name="Request Budget",
+            value=f"{governor_stats['utilization']:.0%} of {governor_stats['rate']:g}/s used over the last minute, "
+            f"{governor_stats['waiting']} waiting, polls {governor_stats['granted']['poll']} "
+            f"({governor_stats['avg_wait']['poll']:.2f}s avg wait), commands {governor_stats['granted']['command']} "
+            f"({governor_stats['avg_wait']['command']:.2f}s avg wait, {governor_stats['timed_out']} gave up)",
+            inline=False,
+        )
+        pool_stats = self.fetcher.parse_pool.stats()
+        embed.add_field(
+            name="Parser Pool",
+            value=f"{pool_stats['mode']} x{pool_stats['workers']}, {pool_stats['pending']} pending, {pool_stats['restarts']} restarts, "
+            f"{pool_stats['avg_parse_ms']:.1f} ms parse / {pool_stats['avg_wait_ms']:.1f} ms wait",
+            inline=False,
+        )
+        cache_stats = self.fetcher.cache.stats()
+        embed.add_field(
+            name="Snapshot Cache",
+            value=f"{cache_stats['size']} games, {cache_stats['hit_rate']:.0%} hits "
+            f"(fresh: {cache_stats['hits']}, failed: {cache_stats['negative_hits']}, misses: {cache_stats['misses']})",
+            inline=False,
+        )
+        outbox_stats = self.outbox.stats()
+        embed.add_field(
+            name="Outbox",
+            value=f"{outbox_stats['pending']} queued in {outbox_stats['channels']} channels, "
+            f"{outbox_stats['delivered']} sent, {outbox_stats['coalesced']} merged, {outbox_stats['failed']} failed, "
+            f"latency {outbox_stats['latency_avg']:.1f}s avg / {outbox_stats['latency_p90']:.1f}s p90",
+            inline=False,
+        )
+        dashboard_stats = self.dashboards.stats()
+        embed.add_field(
+            name="Dashboards",
+            value=f"{dashboard_stats['dashboards']} dashboards, {dashboard_stats['pending']} edits scheduled, "
+            f"{dashboard_stats['edits']} edited, {dashboard_stats['coalesced']} merged, {dashboard_stats['failed']} failed",
+            inline=False,
+        )
+        reminder_stats = self.reminders.stats()
+        embed.add_field(
+            name="Reminders",
+            value=f"{reminder_stats['pending']} timers for {reminder_stats['armed']} games, {reminder_stats['fired']} fired",
+            inline=False,
+        )
+        store_stats = self.store.stats()
+        embed.add_field(
+            name="Persistence",
+            value=f"{store_stats['dirty']} files dirty, {store_stats['saves']} saves wrote {store_stats['files_written']} files "
+            f"({store_stats['bytes_written'] / 1024:.0f} KiB), last save {store_stats['last_save_ms']:.1f} ms, "
+            f"{store_stats['failures']} failures",
+            inline=False,
         )
         await context.send(embed=embed)
 
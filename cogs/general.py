@@ -2,7 +2,6 @@
 import platform
 import random
 
-import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands
@@ -267,24 +266,23 @@ class General(commands.Cog, name="general"):
         :param context: The hybrid command context.
         """
         # This will prevent your bot from stopping everything when doing a web request - see: https://discordpy.readthedocs.io/en/stable/faq.html#how-do-i-make-a-web-request
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                "https://api.coindesk.com/v1/bpi/currentprice/BTC.json"
-            ) as request:
-                if request.status == 200:
-                    data = await request.json()
-                    embed = discord.Embed(
-                        title="Bitcoin price",
-                        description=f"The current price is {data['bpi']['USD']['rate']} :dollar:",
-                        color=0xBEBEFE,
-                    )
-                else:
-                    embed = discord.Embed(
-                        title="Error!",
-                        description="There is something wrong with the API, please try again later",
-                        color=0xE02B2B,
-                    )
-                await context.send(embed=embed)
+        async with self.bot.http_session.get(
+            "https://api.coindesk.com/v1/bpi/currentprice/BTC.json"
+        ) as request:
+            if request.status == 200:
+                data = await request.json()
+                embed = discord.Embed(
+                    title="Bitcoin price",
+                    description=f"The current price is {data['bpi']['USD']['rate']} :dollar:",
+                    color=0xBEBEFE,
+                )
+            else:
+                embed = discord.Embed(
+                    title="Error!",
+                    description="There is something wrong with the API, please try again later",
+                    color=0xE02B2B,
+                )
+            await context.send(embed=embed)
 
     @app_commands.command(
         name="feedback", description="Submit a feedback for the owners of the bot"
@@ -6,12 +6,409 @@ Description:
 Version: 6.2.0
 """
 
+import asyncio
+import json
+
 import aiosqlite
 
+# SQLite limits the number of parameters of a statement
+QUERY_CHUNK_SIZE = 500
+
 
 class DatabaseManager:
-    def __init__(self, *, connection: aiosqlite.Connection) -> None:
+    def __init__(self, *, connection: aiosqlite.Connection, commit_delay: float = 1.0) -> None:
+        """
+        :param connection: The connection to the bot database.
+        :param commit_delay: The seconds writes of the game tables are batched for before being committed.
+        """
         self.connection = connection
+        self.commit_delay = commit_delay
+        self._commit_task = None
+        self._deferred = set()
+        self.commits = 0
+
+    async def setup(self) -> None:
+        """
+        This function will configure the connection: the write-ahead log lets readers and
+        the writer work at the same time, and makes batched commits cheap.
+        """
+        await self.connection.execute("PRAGMA journal_mode=WAL")
+        await self.connection.execute("PRAGMA synchronous=NORMAL")
+
+    def schedule_commit(self) -> None:
+        """
+        This function will commit the pending writes after commit_delay seconds, together
+        with every write made until then.
+        """
+        if self._commit_task is None:
+            self._commit_task = asyncio.create_task(self._commit_later())
+
+    async def _commit_later(self) -> None:
+        await asyncio.sleep(self.commit_delay)
+        self._commit_task = None
+        await self.flush()
+
+    def defer(self, coroutine) -> None:
+        """
+        This function will run a write without waiting for it, for callers that are not coroutines.
+
+        :param coroutine: The write to run, such as delete_game_status(game_id).
+        """
+        task = asyncio.create_task(coroutine)
+        self._deferred.add(task)
+        task.add_done_callback(self._deferred.discard)
+
+    async def flush(self) -> None:
+        """
+        This function will commit the pending writes now.
+        """
+        if self._deferred:
+            await asyncio.gather(*self._deferred, return_exceptions=True)
+        if self.connection.in_transaction:
+            await self.connection.commit()
+            self.commits += 1
+
+    async def close(self) -> None:
+        """
+        This function will commit the pending writes and close the connection.
+        """
+        if self._commit_task is not None:
+            self._commit_task.cancel()
+            self._commit_task = None
+        await self.flush()
+        await self.connection.close()
+
+    async def register_player(self, game_id: str, nation: str, user_id: int) -> None:
+        """
+        This function will register the player of a nation in a game, replacing the previous one.
+
+        :param game_id: The ID of the Dominions game.
+        :param nation: The name of the nation.
+        :param user_id: The ID of the user playing the nation.
+        """
+        await self.connection.execute(
+            "INSERT OR REPLACE INTO registered_players(game_id, nation, user_id) VALUES (?, ?, ?)",
+            (
+                game_id,
+                nation,
+                user_id,
+            ),
+        )
+        self.schedule_commit()
+
+    async def get_registered_players(self, game_id: str) -> dict:
+        """
+        This function will get the registered players of a game.
+
+        :param game_id: The ID of the Dominions game.
+        :return: The user IDs of the registered players by nation name.
+        """
+        rows = await self.connection.execute(
+            "SELECT nation, user_id FROM registered_players WHERE game_id=?",
+            (game_id,),
+        )
+        async with rows as cursor:
+            return {nation: user_id for nation, user_id in await cursor.fetchall()}
+
+    async def save_game_status(self, game_id: str, snapshot: dict, status: str, observed_at: float) -> None:
+        """
+        This function will store the latest snapshot of a game.
+
+        :param game_id: The ID of the Dominions game.
+        :param snapshot: The snapshot as a dict, from GameSnapshot.to_dict.
+        :param status: The game status, stored in its own column to query on it.
+        :param observed_at: The wall clock time the snapshot was taken.
+        """
+        await self.connection.execute(
+            "INSERT OR REPLACE INTO game_status(game_id, status, snapshot, observed_at) VALUES (?, ?, ?, ?)",
+            (
+                game_id,
+                status,
+                json.dumps(snapshot),
+                observed_at,
+            ),
+        )
+        self.schedule_commit()
+
+    async def get_game_statuses(self, game_ids: list) -> dict:
+        """
+        This function will get the latest snapshots of games.
+
+        :param game_ids: The IDs of the Dominions games.
+        :return: The snapshots as dicts by game ID, for the games that have one.
+        """
+        game_ids = list(game_ids)
+        snapshots = {}
+        for start in range(0, len(game_ids), QUERY_CHUNK_SIZE):
+            chunk = game_ids[start:start + QUERY_CHUNK_SIZE]
+            rows = await self.connection.execute(
+                f"SELECT game_id, snapshot FROM game_status WHERE game_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            async with rows as cursor:
+                for game_id, snapshot in await cursor.fetchall():
+                    snapshots[game_id] = json.loads(snapshot)
+        return snapshots
+
+    async def delete_game_status(self, game_id: str) -> None:
+        """
+        This function will forget the latest snapshot of a game.
+
+        :param game_id: The ID of the Dominions game.
+        """
+        await self.connection.execute("DELETE FROM game_status WHERE game_id=?", (game_id,))
+        self.schedule_commit()
+
+    async def add_history(self, rows: list) -> None:
+        """
+        This function will append rows to the turn history.
+
+        :param rows: The (game_id, turn, nation, status, observed_at) tuples to append.
+        """
+        await self.connection.executemany(
+            "INSERT INTO turn_history(game_id, turn, nation, status, observed_at) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        self.schedule_commit()
+
+    async def get_history(self, game_id: str, nation: str = None, since: float = None) -> list:
+        """
+        This function will get the turn history of a game in the order it was observed.
+
+        :param game_id: The ID of the Dominions game.
+        :param nation: Only get the rows of this nation.
+        :param since: Only get the rows observed at or after this wall clock time.
+        :return: A list of (turn, nation, status, observed_at) tuples, nation is None for game status rows.
+        """
+        query = "SELECT turn, nation, status, observed_at FROM turn_history WHERE game_id=?"
+        parameters = [game_id]
+        if nation is not None:
+            query += " AND nation=?"
+            parameters.append(nation)
+        if since is not None:
+            query += " AND observed_at>=?"
+            parameters.append(since)
+        rows = await self.connection.execute(query + " ORDER BY observed_at, id", parameters)
+        async with rows as cursor:
+            return await cursor.fetchall()
+
+    async def get_game_stats(self, game_id: str):
+        """
+        This function will get the turn aggregates of a game.
+
+        :param game_id: The ID of the Dominions game.
+        :return: A (turn, turn_started_at, turns, turn_seconds) tuple, or None if no turn change was observed yet.
+        """
+        rows = await self.connection.execute(
+            "SELECT turn, turn_started_at, turns, turn_seconds FROM game_stats WHERE game_id=?",
+            (game_id,),
+        )
+        async with rows as cursor:
+            return await cursor.fetchone()
+
+    async def record_turn(self, game_id: str, turn: int, started_at: float) -> None:
+        """
+        This function will record the start of a turn, adding the duration of the previous
+        turn to the aggregates if it was observed from its start.
+
+        :param game_id: The ID of the Dominions game.
+        :param turn: The number of the turn that started.
+        :param started_at: The wall clock time the turn change was observed.
+        """
+        await self.connection.execute(
+            """
+            INSERT INTO game_stats(game_id, turn, turn_started_at) VALUES (?, ?, ?)
+            ON CONFLICT(game_id) DO UPDATE SET
+                turns = turns + (turn_started_at IS NOT NULL AND excluded.turn = turn + 1),
+                turn_seconds = turn_seconds + CASE
+                    WHEN turn_started_at IS NOT NULL AND excluded.turn = turn + 1
+                    THEN excluded.turn_started_at - turn_started_at ELSE 0 END,
+                turn = excluded.turn,
+                turn_started_at = excluded.turn_started_at
+            """,
+            (
+                game_id,
+                turn,
+                started_at,
+            ),
+        )
+        self.schedule_commit()
+
+    async def increment_nation_stats(self, game_id: str, nations: list, counter: str) -> None:
+        """
+        This function will add one to a counter of nations of a game.
+
+        :param game_id: The ID of the Dominions game.
+        :param nations: The names of the nations.
+        :param counter: One of turns, last_to_submit and went_ai.
+        """
+        if counter not in ("turns", "last_to_submit", "went_ai"):
+            raise ValueError(f"Unknown nation counter {counter}")
+        await self.connection.executemany(
+            f"INSERT INTO nation_stats(game_id, nation, {counter}) VALUES (?, ?, 1) "
+            f"ON CONFLICT(game_id, nation) DO UPDATE SET {counter} = {counter} + 1",
+            [(game_id, nation) for nation in nations],
+        )
+        self.schedule_commit()
+
+    async def add_submission(self, game_id: str, nation: str, turn: int, seconds: float, bucket: int) -> None:
+        """
+        This function will record how long after the start of a turn a nation submitted it,
+        and count it in the submission time histogram of the nation.
+
+        :param game_id: The ID of the Dominions game.
+        :param nation: The name of the nation.
+        :param turn: The number of the turn.
+        :param seconds: The seconds between the start of the turn and the submission.
+        :param bucket: The histogram bucket of the submission time, from status.stats.submit_bucket.
+        """
+        cursor = await self.connection.execute(
+            "INSERT OR IGNORE INTO submission_times(game_id, nation, turn, seconds) VALUES (?, ?, ?, ?)",
+            (
+                game_id,
+                nation,
+                turn,
+                seconds,
+            ),
+        )
+        if cursor.rowcount:
+            await self.connection.execute(
+                "INSERT INTO nation_stats(game_id, nation, submissions) VALUES (?, ?, 1) "
+                "ON CONFLICT(game_id, nation) DO UPDATE SET submissions = submissions + 1",
+                (
+                    game_id,
+                    nation,
+                ),
+            )
+            await self.connection.execute(
+                "INSERT INTO submission_histogram(game_id, nation, bucket, submissions) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(game_id, nation, bucket) DO UPDATE SET submissions = submissions + 1",
+                (
+                    game_id,
+                    nation,
+                    bucket,
+                ),
+            )
+        self.schedule_commit()
+
+    async def backfill_submission_histogram(self, bucket_of) -> int:
+        """
+        This function will build the submission time histograms from the recorded submission
+        times, if there are none yet, and commit them.
+
+        :param bucket_of: The function returning the histogram bucket of a submission time.
+        :return: The number of histogram rows written.
+        """
+        rows = await self.connection.execute("SELECT 1 FROM submission_histogram LIMIT 1")
+        async with rows as cursor:
+            if await cursor.fetchone() is not None:
+                return 0
+        counts = {}
+        rows = await self.connection.execute("SELECT game_id, nation, seconds FROM submission_times")
+        async with rows as cursor:
+            async for game_id, nation, seconds in cursor:
+                key = (game_id, nation, bucket_of(seconds))
+                counts[key] = counts.get(key, 0) + 1
+        if counts:
+            await self.connection.executemany(
+                "INSERT INTO submission_histogram(game_id, nation, bucket, submissions) VALUES (?, ?, ?, ?)",
+                [(*key, count) for key, count in counts.items()],
+            )
+            await self.connection.commit()
+        return len(counts)
+
+    async def get_last_submitters(self, game_id: str, turn: int) -> list:
+        """
+        This function will get the nations that submitted a turn last.
+
+        :param game_id: The ID of the Dominions game.
+        :param turn: The number of the turn.
+        :return: The names of the nations, several if their submissions were observed by the same poll.
+        """
+        rows = await self.connection.execute(
+            "SELECT nation FROM submission_times WHERE game_id=? AND turn=? "
+            "AND seconds=(SELECT MAX(seconds) FROM submission_times WHERE game_id=? AND turn=?)",
+            (
+                game_id,
+                turn,
+                game_id,
+                turn,
+            ),
+        )
+        async with rows as cursor:
+            return [nation for nation, in await cursor.fetchall()]
+
+    async def get_nation_stats(self, game_id: str) -> list:
+        """
+        This function will get the aggregates of every nation of a game.
+
+        :param game_id: The ID of the Dominions game.
+        :return: A list of (nation, turns, submissions, last_to_submit, went_ai, submission time histogram) tuples.
+        """
+        histograms = {}
+        rows = await self.connection.execute(
+            "SELECT nation, bucket, submissions FROM submission_histogram WHERE game_id=?",
+            (game_id,),
+        )
+        async with rows as cursor:
+            for nation, bucket, count in await cursor.fetchall():
+                histograms.setdefault(nation, {})[bucket] = count
+        rows = await self.connection.execute(
+            "SELECT nation, turns, submissions, last_to_submit, went_ai FROM nation_stats WHERE game_id=?",
+            (game_id,),
+        )
+        async with rows as cursor:
+            return [(*row, histograms.get(row[0], {})) for row in await cursor.fetchall()]
+
+    async def get_player_stats(self, user_id: int) -> list:
+        """
+        This function will get the aggregates of the nations a user is registered for.
+
+        :param user_id: The ID of the user.
+        :return: A list of (game_id, nation, turns, submissions, last_to_submit, went_ai, submission time histogram) tuples.
+        """
+        histograms = {}
+        rows = await self.connection.execute(
+            "SELECT h.game_id, h.nation, h.bucket, h.submissions FROM registered_players r "
+            "JOIN submission_histogram h ON h.game_id = r.game_id AND h.nation = r.nation WHERE r.user_id=?",
+            (user_id,),
+        )
+        async with rows as cursor:
+            for game_id, nation, bucket, count in await cursor.fetchall():
+                histograms.setdefault((game_id, nation), {})[bucket] = count
+        rows = await self.connection.execute(
+            "SELECT r.game_id, r.nation, COALESCE(n.turns, 0), COALESCE(n.submissions, 0), "
+            "COALESCE(n.last_to_submit, 0), COALESCE(n.went_ai, 0) FROM registered_players r "
+            "LEFT JOIN nation_stats n ON n.game_id = r.game_id AND n.nation = r.nation WHERE r.user_id=?",
+            (user_id,),
+        )
+        async with rows as cursor:
+            return [(*row, histograms.get((row[0], row[1]), {})) for row in await cursor.fetchall()]
+
+    async def import_json_state(self, registered_players: dict, game_statuses: dict) -> None:
+        """
+        This function will import the state the Dominions cog used to keep in JSON files,
+        without overwriting rows already in the database, and commit it.
+
+        :param registered_players: The user IDs of the registered players by nation name by game ID.
+        :param game_statuses: The snapshots as dicts by game ID.
+        """
+        await self.connection.executemany(
+            "INSERT OR IGNORE INTO registered_players(game_id, nation, user_id) VALUES (?, ?, ?)",
+            [
+                (game_id, nation, user_id)
+                for game_id, players in registered_players.items()
+                for nation, user_id in players.items()
+            ],
+        )
+        await self.connection.executemany(
+            "INSERT OR IGNORE INTO game_status(game_id, status, snapshot, observed_at) VALUES (?, ?, ?, ?)",
+            [
+                (game_id, snapshot.get("status"), json.dumps(snapshot), snapshot.get("observed_at", 0.0))
+                for game_id, snapshot in game_statuses.items()
+            ],
+        )
+        await self.flush()
 
     async def add_warn(
         self, user_id: int, server_id: int, moderator_id: int, reason: str
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_json(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode("utf-8")
+
+
+def encode_lines(data: list) -> bytes:
+    return "".join(f"{line}\n" for line in data).encode("utf-8")
+
+
+def write_atomic(path: str, payload: bytes) -> None:
+    """
+    Write a file so that it holds either its previous or its new content after a crash:
+    the payload is written and synced to a temporary file, which is then renamed over it.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    if hasattr(os, "O_DIRECTORY"):
+        # Make the rename itself durable
+        folder = os.open(os.path.dirname(path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(folder)
+        finally:
+            os.close(folder)
+
+
+class FileStore:
+    """
+    Saves the collections a cog keeps in files of its data folder.
+
+    Each collection is registered with a function returning its current content. Changes
+    are reported with ``mark_dirty``, which schedules a save ``save_delay`` seconds later;
+    a save only writes the dirty collections. Files are encoded and written atomically in a
+    worker thread, so saving never blocks the event loop. ``.txt`` files hold one line per
+    item of a list, every other file holds JSON.
+    """
+
+    def __init__(self, folder: str, *, save_delay: float = 5, logger=None) -> None:
+        """
+        :param folder: The folder of the files.
+        :param save_delay: The seconds changes are batched for before being saved.
+        :param logger: The logger used to report saves and unreadable files.
+        """
+        self.folder = folder
+        self.save_delay = save_delay
+        self.logger = logger or logging.getLogger("discord_bot")
+        os.makedirs(folder, exist_ok=True)
+        self._collections = {}  # filename -> function returning the content
+        self._dirty = set()
+        self._save_task = None
+        self._lock = asyncio.Lock()
+        self.saves = 0
+        self.files_written = 0
+        self.bytes_written = 0
+        self.last_save_ms = 0.0
+        self.failures = 0
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.folder, filename)
+
+    def register(self, filename: str, snapshot) -> None:
+        """
+        :param filename: The name of the file in the data folder.
+        :param snapshot: Function returning the content to save. It must return a new object, as it is encoded in another thread.
+        """
+        self._collections[filename] = snapshot
+
+    def load(self, filename: str, default=None):
+        """
+        Load a file. A JSON file that can't be decoded is kept aside with a ``.corrupt``
+        suffix instead of being overwritten by the next save.
+
+        :return: The content of the file, or ``default`` (an empty dict or list) if it is missing or corrupt.
+        """
+        is_lines = filename.endswith(".txt")
+        if default is None:
+            default = [] if is_lines else {}
+        path = self.path(filename)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return default
+        if is_lines:
+            return [line.strip() for line in content.decode("utf-8").splitlines() if line.strip()]
+        try:
+            return orjson.loads(content) if orjson is not None else json.loads(content)
+        except ValueError as e:
+            corrupt = f"{path}.corrupt-{int(time.time())}"
+            os.replace(path, corrupt)
+            self.logger.error(f"Could not decode {filename} ({e}), moved it to {corrupt} and started empty")
+            return default
+
+    def mark_dirty(self, filename: str) -> None:
+        """Schedule a save of a collection that changed."""
+        self._dirty.add(filename)
+        if self._save_task is None:
+            self._save_task = asyncio.create_task(self._save_later())
+
+    async def _save_later(self) -> None:
+        await asyncio.sleep(self.save_delay)
+        self._save_task = None
+        await self.save()
+
+    async def save(self, force: bool = False) -> int:
+        """
+        Write the dirty collections.
+
+        :param force: Write every collection, dirty or not.
+        :return: The number of bytes written.
+        """
+        async with self._lock:
+            filenames = set(self._collections) if force else self._dirty & set(self._collections)
+            if not filenames:
+                return 0
+            # Marks made while writing schedule another save
+            self._dirty -= filenames
+            contents = {filename: self._collections[filename]() for filename in filenames}
+            started_at = time.perf_counter()
+            try:
+                written = await asyncio.to_thread(self._write_all, contents)
+            except OSError as e:
+                self.failures += 1
+                self._dirty |= filenames
+                self.logger.error(f"Could not save {', '.join(sorted(filenames))}: {e}")
+                return 0
+            self.last_save_ms = (time.perf_counter() - started_at) * 1000
+            self.saves += 1
+            self.files_written += len(filenames)
+            self.bytes_written += written
+            self.logger.info(
+                f"Saved {', '.join(sorted(filenames))} ({written} bytes) in {self.last_save_ms:.1f} ms"
+            )
+            return written
+
+    def _write_all(self, contents: dict) -> int:
+        written = 0
+        for filename, content in contents.items():
+            payload = encode_lines(content) if filename.endswith(".txt") else encode_json(content)
+            write_atomic(self.path(filename), payload)
+            written += len(payload)
+        return written
+
+    async def close(self) -> None:
+        """Cancel the scheduled save and write the dirty collections now."""
+        if self._save_task is not None:
+            self._save_task.cancel()
+            self._save_task = None
+        await self.save()
+
+    def stats(self) -> dict:
+        return {
+            "dirty": len(self._dirty),
+            "saves": self.saves,
+            "files_written": self.files_written,
+            "bytes_written": self.bytes_written,
+            "last_save_ms": self.last_save_ms,
+            "failures": self.failures,
+        }
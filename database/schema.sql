@@ -5,4 +5,70 @@ CREATE TABLE IF NOT EXISTS `warns` (
   `moderator_id` varchar(20) NOT NULL,
   `reason` varchar(255) NOT NULL,
   `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS `registered_players` (
+  `game_id` varchar(20) NOT NULL,
+  `nation` varchar(50) NOT NULL,
+  `user_id` integer NOT NULL,
+  `registered_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`game_id`, `nation`)
+);
+
+CREATE INDEX IF NOT EXISTS `registered_players_user_id` ON `registered_players` (`user_id`);
+
+CREATE TABLE IF NOT EXISTS `game_status` (
+  `game_id` varchar(20) NOT NULL PRIMARY KEY,
+  `status` varchar(255),
+  `snapshot` text NOT NULL,
+  `observed_at` real NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS `turn_history` (
+  `id` integer PRIMARY KEY AUTOINCREMENT,
+  `game_id` varchar(20) NOT NULL,
+  `turn` int(11),
+  `nation` varchar(50),
+  `status` varchar(255) NOT NULL,
+  `observed_at` real NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS `turn_history_game_id` ON `turn_history` (`game_id`, `observed_at`);
+
+CREATE INDEX IF NOT EXISTS `turn_history_nation` ON `turn_history` (`game_id`, `nation`, `observed_at`);
+
+CREATE TABLE IF NOT EXISTS `game_stats` (
+  `game_id` varchar(20) NOT NULL PRIMARY KEY,
+  `turn` int(11),
+  `turn_started_at` real,
+  `turns` int(11) NOT NULL DEFAULT 0,
+  `turn_seconds` real NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS `nation_stats` (
+  `game_id` varchar(20) NOT NULL,
+  `nation` varchar(50) NOT NULL,
+  `turns` int(11) NOT NULL DEFAULT 0,
+  `submissions` int(11) NOT NULL DEFAULT 0,
+  `last_to_submit` int(11) NOT NULL DEFAULT 0,
+  `went_ai` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`game_id`, `nation`)
+);
+
+CREATE TABLE IF NOT EXISTS `submission_times` (
+  `game_id` varchar(20) NOT NULL,
+  `nation` varchar(50) NOT NULL,
+  `turn` int(11) NOT NULL,
+  `seconds` real NOT NULL,
+  PRIMARY KEY (`game_id`, `nation`, `turn`)
+);
+
+CREATE INDEX IF NOT EXISTS `submission_times_turn` ON `submission_times` (`game_id`, `turn`);
+
+CREATE TABLE IF NOT EXISTS `submission_histogram` (
+  `game_id` varchar(20) NOT NULL,
+  `nation` varchar(50) NOT NULL,
+  `bucket` int(11) NOT NULL,
+  `submissions` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`game_id`, `nation`, `bucket`)
+);
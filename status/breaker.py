@@ -0,0 +1,120 @@
+import logging
+import random
+import time
+from enum import Enum
+
+
+def backoff_delay(attempt: int, *, base: float, cap: float, rng: random.Random = random) -> float:
+    """
+    Return the delay before retry number ``attempt`` (from 1), drawn uniformly between half
+    and all of ``base * 2 ** (attempt - 1)``, capped at ``cap``. The jitter keeps callers that
+    failed together from retrying together.
+    """
+    delay = min(cap, base * 2 ** min(attempt - 1, 32))
+    return rng.uniform(delay / 2, delay)
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half open"
+
+
+class CircuitBreaker:
+    """
+    Stops requests to a host while it is failing.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and every request is
+    refused for ``reset_timeout`` seconds. The first request after that is let through as a
+    probe: if it succeeds the breaker closes, otherwise it opens again for twice as long, up
+    to ``max_reset_timeout``.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        max_reset_timeout: float = 300,
+        logger=None,
+    ) -> None:
+        """
+        :param host: The host the breaker guards, used in log messages.
+        :param failure_threshold: The number of consecutive failures opening the breaker.
+        :param reset_timeout: The seconds the breaker first stays open for.
+        :param max_reset_timeout: The longest the breaker stays open for after failed probes.
+        :param logger: The logger used to report the breaker opening and closing.
+        """
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.logger = logger or logging.getLogger("discord_bot")
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.open_for = reset_timeout
+        self.probing = False
+        self.trips = 0
+        self.refused = 0
+
+    def allow(self) -> bool:
+        """Return whether a request may be sent now. Only one probe is let through at a time."""
+        if self.state is BreakerState.CLOSED:
+            return True
+        if self.state is BreakerState.OPEN:
+            if self.retry_in() > 0:
+                self.refused += 1
+                return False
+            self.state = BreakerState.HALF_OPEN
+        if self.probing:
+            self.refused += 1
+            return False
+        self.probing = True
+        return True
+
+    def retry_in(self) -> float:
+        """The seconds until the breaker lets a probe through, 0 if it is not open."""
+        if self.state is not BreakerState.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.open_for - time.monotonic())
+
+    def record_success(self) -> None:
+        if self.state is not BreakerState.CLOSED:
+            self.logger.info(f"{self.host} is responding again, resuming requests")
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.open_for = self.reset_timeout
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state is BreakerState.HALF_OPEN:
+            # The probe failed, wait longer before the next one
+            self.open_for = min(self.max_reset_timeout, self.open_for * 2)
+            self._open()
+        elif self.state is BreakerState.CLOSED and self.failures >= self.failure_threshold:
+            self.trips += 1
+            self._open()
+            self.logger.warning(
+                f"{self.host} failed {self.failures} requests in a row, pausing requests for {self.open_for:.0f}s"
+            )
+
+    def release(self) -> None:
+        """End a probe that neither succeeded nor failed, such as a cancelled request."""
+        self.probing = False
+
+    def _open(self) -> None:
+        self.state = BreakerState.OPEN
+        self.opened_at = time.monotonic()
+        self.probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state.value,
+            "failures": self.failures,
+            "retry_in": self.retry_in(),
+            "trips": self.trips,
+            "refused": self.refused,
+        }
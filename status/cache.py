@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+
+
+class SnapshotCache:
+    """
+    Bounded, least recently used cache of the last fetched page of each game.
+
+    Entries are stored by the fetcher for every fetch, whether it came from a watch poll or a
+    command. Successful pages are fresh for ``ttl`` seconds; failed fetches are remembered for
+    ``negative_ttl`` seconds so repeated lookups of a wrong game ID don't reach the server.
+    """
+
+    def __init__(self, *, max_entries: int = 1024, ttl: float = 60, negative_ttl: float = 300) -> None:
+        """
+        :param max_entries: The number of games kept before the least recently used is evicted.
+        :param ttl: The age in seconds after which a successful page is stale.
+        :param negative_ttl: The age in seconds after which a failed fetch is forgotten.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, game_id: str):
+        """
+        Return the last successful page state of a game regardless of its age.
+
+        :param game_id: The ID of the Dominions game.
+        """
+        state = self.entries.get(game_id)
+        if state is None or not state.result.ok:
+            return None
+        self.entries.move_to_end(game_id)
+        return state
+
+    def fresh(self, game_id: str, max_age: float = None):
+        """
+        Return the cached fetch result of a game if it is recent enough to answer from.
+
+        :param game_id: The ID of the Dominions game.
+        :param max_age: The maximum age in seconds of a successful page, defaults to the cache TTL.
+        :return: The cached result, which may be a failed fetch, or None on a miss.
+        """
+        state = self.entries.get(game_id)
+        if state is not None:
+            age = time.monotonic() - state.fetched_at
+            if state.result.ok and age <= (self.ttl if max_age is None else max_age):
+                self.hits += 1
+                self.entries.move_to_end(game_id)
+                return state.result
+            if not state.result.ok and age <= self.negative_ttl:
+                self.negative_hits += 1
+                return state.result
+        self.misses += 1
+        return None
+
+    def put(self, game_id: str, state) -> None:
+        """
+        Store the page state of a game, evicting the least recently used games over the limit.
+
+        :param game_id: The ID of the Dominions game.
+        :param state: The page state, successful or not.
+        """
+        self.entries[game_id] = state
+        self.entries.move_to_end(game_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, game_id: str) -> None:
+        self.entries.pop(game_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
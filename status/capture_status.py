@@ -1,14 +1,181 @@
+import html
+import re
+
 import requests
 from bs4 import BeautifulSoup
+from bs4.filter import ElementFilter
+
+try:
+    from lxml import etree as lxml_etree
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
 
 # Example usage
 # game_id = '520'
 # html_content = get_raw_html_page(game_id)
 
-def extract_status_data(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
+_NEXT_TURN_CELL = re.compile(rb"<td[^>]*>\s*next turn\s*</td>\s*<td[^>]*>(.*?)</td>", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(rb"<[^>]+>")
+_TIME_PART = re.compile(r"(\d+(?:\.\d+)?)\s*(day|hour|minute)", re.IGNORECASE)
+_UNIT_HOURS = {"day": 24, "hour": 1, "minute": 1 / 60}
+
+
+def status_region(html_content: bytes) -> bytes:
+    """
+    Return the part of a game page that extract_status_data reads, from the lobby title to
+    the end of the players tables, without the text of the "Next turn" countdown. Hashing
+    this instead of the whole page ignores the head, the turn log and the countdown, which
+    changes every minute; next_turn_text reads the countdown separately.
+    """
+    start = max(html_content.find(b"<h1"), 0)
+    scanner = SectionScanner()
+    if scanner.feed(html_content):
+        end = scanner.end
+    else:
+        end = html_content.rfind(b"</body")
+        if end <= start:
+            end = len(html_content)
+    region = html_content[start:end]
+    match = _NEXT_TURN_CELL.search(region)
+    if match:
+        region = region[:match.start(1)] + region[match.end(1):]
+    return region
+
+
+def next_turn_text(html_content: bytes) -> str:
+    """
+    Return the text of the "Next turn" row of a game page as extract_status_data reads it, or
+    None if the page has no such row.
+    """
+    match = _NEXT_TURN_CELL.search(html_content)
+    if match is None:
+        return None
+    return html.unescape(_TAG.sub(b"", match.group(1)).decode("utf-8", errors="replace")).strip()
+
+
+_DIV_TAG = re.compile(rb"<(/?)div\b([^>]*)>", re.IGNORECASE)
+_H1_END = re.compile(rb"</h1\s*>", re.IGNORECASE)
+_STATUS_ID = re.compile(rb"""(?<![\w-])id\s*=\s*["']?status(?:["'\s/]|$)""", re.IGNORECASE)
+_PLAYERS_CLASS = re.compile(rb"""(?<![\w-])class\s*=\s*["']?[^"'>]*(?<![\w-])players(?![\w-])""", re.IGNORECASE)
+
+
+class SectionScanner:
+    """
+    Finds the end of the sections extract_status_data reads in a page fed in chunks, so the
+    rest of the page doesn't need to be downloaded or parsed.
+
+    The page is scanned as bytes for the closing tag of the first ``h1``, and the ``div`` tags
+    opening and closing the ``#status`` pane and the ``.players`` tables. ``end`` is set once
+    all three are complete; ``buffer[:end]`` then parses the same as the whole page.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.end = None
+        self._pos = 0  # Where the next scan starts, at the last tag that may be incomplete
+        self._h1_end = None
+        self._sections = {"status": None, "players": None}  # name -> (depth, end offset or None)
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Add the next chunk of the page.
+
+        :return: True once the sections are complete.
+        """
+        self.buffer += chunk
+        if self.end is None:
+            self._scan()
+        return self.end is not None
+
+    def _scan(self) -> None:
+        buffer = self.buffer
+        if self._h1_end is None:
+            match = _H1_END.search(buffer, max(0, self._pos - 8))
+            if match:
+                self._h1_end = match.end()
+        pos = self._pos
+        for match in _DIV_TAG.finditer(buffer, self._pos):
+            pos = match.end()
+            closing, attributes = match.group(1), match.group(2)
+            for name, state in self._sections.items():
+                if state is None:
+                    if not closing and (_STATUS_ID if name == "status" else _PLAYERS_CLASS).search(attributes):
+                        self._sections[name] = [1, None]
+                elif state[1] is None:
+                    state[0] += -1 if closing else 1
+                    if state[0] == 0:
+                        state[1] = match.end()
+            sections = self._sections.values()
+            if self._h1_end is not None and all(state is not None and state[1] is not None for state in sections):
+                self.end = max(self._h1_end, *(state[1] for state in sections))
+                return
+        # The last tag may be cut by the end of the chunk, scan it again with the next one
+        last_tag = buffer.rfind(b"<", pos)
+        self._pos = last_tag if last_tag != -1 else len(buffer)
+
+
+def parse_time_string(time_str: str) -> float:
+    """
+    Parse a time string such as "1 day, 3 hours, 12 minutes" and return total hours as float.
+    Text without a number of days, hours or minutes, such as "Waiting for submissions" or
+    "less than a minute", counts as 0.
+    """
+    return sum(float(value) * _UNIT_HOURS[unit.lower()] for value, unit in _TIME_PART.findall(time_str))
+
+
+def extract_status_data(html_content, backend: str = None, encoding: str = None):
+    """
+    Extract the lobby name, the players and the game info from a game page.
+
+    :param html_content: The HTML of the game page, as text or bytes.
+    :param backend: The name of a parser backend from BACKENDS, defaults to DEFAULT_BACKEND.
+    :param encoding: The encoding of the page if it is given as bytes.
+    :return: A tuple of the lobby name, the list of players and the game info dict.
+    :raises ValueError: If the page has no lobby title, such as an error page.
+    """
+    return BACKENDS[backend or DEFAULT_BACKEND](html_content, encoding)
+
+
+def _soup(html_content, encoding, **kwargs):
+    if isinstance(html_content, (bytes, bytearray)):
+        kwargs["from_encoding"] = encoding
+    return BeautifulSoup(html_content, 'html.parser', **kwargs)
+
+
+def extract_status_data_reference(html_content, encoding=None):
+    """Reference backend: parse the whole page with BeautifulSoup's html.parser."""
+    return _extract_from_soup(_soup(html_content, encoding))
+
+
+class _StatusSectionFilter(ElementFilter):
+    """Only builds the lobby title, the status pane and the players tables of a page."""
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        if name == 'h1':
+            return True
+        if name != 'div' or not attrs:
+            return False
+        classes = attrs.get('class') or ''
+        if not isinstance(classes, str):
+            classes = ' '.join(classes)
+        return attrs.get('id') == 'status' or 'players' in classes.split()
+
+    def allow_string_creation(self, string):
+        return False
+
+
+def extract_status_data_strainer(html_content, encoding=None):
+    """Backend that only builds the tags extract_status_data reads, skipping the rest of the page."""
+    return _extract_from_soup(_soup(html_content, encoding, parse_only=_StatusSectionFilter()))
+
+
+def _extract_from_soup(soup):
     status_div = soup.find('div', id='status')
-    lobby_name = soup.find('h1').text.strip()
+    h1 = soup.find('h1')
+    if h1 is None:
+        raise ValueError("no lobby title")
+    lobby_name = h1.text.strip()
     if status_div:
         pane_status_div = status_div.find('div', class_='pane status')
         players = []
@@ -48,3 +215,69 @@ def extract_status_data(html_content):
     else:
         return lobby_name, 'No status div found', 'No status div found'
 
+
+def _has_class(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def _text(element):
+    return element.text_content().strip()
+
+
+def extract_status_data_lxml(html_content, encoding=None):
+    """Backend that parses the page with lxml and reads it with XPath queries. Bytes are decoded by libxml2."""
+    parser = None
+    if isinstance(html_content, (bytes, bytearray)):
+        html_content = bytes(html_content)
+        if encoding:
+            parser = lxml_html.HTMLParser(encoding=encoding)
+    try:
+        document = lxml_html.document_fromstring(html_content, parser=parser)
+    except (ValueError, lxml_etree.ParserError):
+        # An empty page, which has no title either
+        document = None
+    h1 = document.xpath('//h1') if document is not None else []
+    if not h1:
+        raise ValueError("no lobby title")
+    lobby_name = _text(h1[0])
+    status_div = document.xpath("//div[@id='status']")
+    if not status_div:
+        return lobby_name, 'No status div found', 'No status div found'
+
+    players = []
+    players_div = document.xpath(f"//div[{_has_class('players')}]")
+    if players_div:
+        for player_table in players_div[0].xpath(f".//table[{_has_class('striped-table')}]"):
+            for row in player_table.xpath(".//tr[contains(@class, 'disciple')]"):
+                nation_td = row.xpath(".//td[normalize-space(@class)='nation-name wide-column']")
+                status_td = row.xpath(".//td")[-1]  # Last <td>
+                if nation_td:
+                    nation_name = ""
+                    nation_b = nation_td[0].xpath(".//b")
+                    nation_epithet = nation_td[0].xpath(f".//span[{_has_class('epithet')}]")
+                    if nation_b:
+                        nation_name += _text(nation_b[0])
+                    if nation_epithet:
+                        nation_name += _text(nation_epithet[0])
+                    players.append({"nation_name": nation_name, "status": _text(status_td)})
+
+    game_info = {}
+    pane_status_div = status_div[0].xpath(".//div[normalize-space(@class)='pane status']")
+    if pane_status_div:
+        for row in pane_status_div[0].xpath(".//tr"):
+            cols = row.xpath(".//td")
+            if len(cols) == 2:
+                key = _text(cols[0]).lower().replace(" ", "_")
+                game_info[key] = _text(cols[1])
+
+    return lobby_name, players, game_info
+
+
+BACKENDS = {
+    'html.parser': extract_status_data_reference,
+    'strainer': extract_status_data_strainer,
+}
+if lxml_html is not None:
+    BACKENDS['lxml'] = extract_status_data_lxml
+
+DEFAULT_BACKEND = 'lxml' if 'lxml' in BACKENDS else 'strainer'
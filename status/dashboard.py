@@ -0,0 +1,124 @@
+import asyncio
+import logging
+
+import discord
+
+
+class DashboardManager:
+    """
+    Keeps one dashboard message per channel up to date by editing it in place.
+
+    Updates are debounced: the first change to a channel's games schedules an edit
+    ``debounce`` seconds later, and every change until then is folded into that edit, so a
+    burst of changes produces at most one edit per window.
+    """
+
+    def __init__(self, render, resolve_channel, *, debounce: float = 10, on_change=None, logger=None) -> None:
+        """
+        :param render: Function called with a channel ID, returning the dashboard embed of the channel.
+        :param resolve_channel: Coroutine function called with a channel ID, returning the channel or None if it is gone.
+        :param debounce: The seconds between a change and the edit of the dashboard.
+        :param on_change: Function called when a dashboard is attached or detached, to save them.
+        :param logger: The logger used to report failed edits.
+        """
+        self.render = render
+        self.resolve_channel = resolve_channel
+        self.on_change = on_change
+        self.debounce = debounce
+        self.logger = logger or logging.getLogger("discord_bot")
+        self.messages = {}  # channel ID -> message ID
+        self._pending = {}  # channel ID -> scheduled edit task
+        self.edits = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self.messages
+
+    def attach(self, channel_id: int, message_id: int) -> int:
+        """
+        Make a message the dashboard of a channel.
+
+        :return: The ID of the previous dashboard message of the channel, or None.
+        """
+        previous = self.messages.get(channel_id)
+        self.messages[channel_id] = message_id
+        self._changed()
+        return previous
+
+    def detach(self, channel_id: int) -> int:
+        """
+        Stop updating the dashboard of a channel.
+
+        :return: The ID of the dashboard message, or None if the channel had none.
+        """
+        task = self._pending.pop(channel_id, None)
+        if task is not None:
+            task.cancel()
+        message_id = self.messages.pop(channel_id, None)
+        if message_id is not None:
+            self._changed()
+        return message_id
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            self.on_change()
+
+    def touch(self, channel_id: int) -> None:
+        """
+        Schedule an edit of the dashboard of a channel, if it has one and none is scheduled yet.
+
+        :param channel_id: The ID of the channel whose games changed.
+        """
+        if channel_id not in self.messages:
+            return
+        if channel_id in self._pending:
+            self.coalesced += 1
+            return
+        self._pending[channel_id] = asyncio.create_task(self._edit_later(channel_id))
+
+    async def _edit_later(self, channel_id: int) -> None:
+        await asyncio.sleep(self.debounce)
+        # Changes from now on schedule a new edit
+        del self._pending[channel_id]
+        message_id = self.messages.get(channel_id)
+        if message_id is None:
+            return
+        channel = await self.resolve_channel(channel_id)
+        if channel is None:
+            self.detach(channel_id)
+            return
+        try:
+            await channel.get_partial_message(message_id).edit(embed=self.render(channel_id))
+        except discord.NotFound:
+            self.logger.info(f"Dashboard message of channel {channel_id} was deleted")
+            self.detach(channel_id)
+        except discord.HTTPException as e:
+            self.failed += 1
+            self.logger.warning(f"Could not edit the dashboard of channel {channel_id}: {type(e).__name__}: {e}")
+        else:
+            self.edits += 1
+
+    async def close(self) -> None:
+        """Cancel the scheduled edits."""
+        tasks = list(self._pending.values())
+        self._pending.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def to_dict(self) -> dict:
+        return {str(channel_id): message_id for channel_id, message_id in self.messages.items()}
+
+    def load(self, data: dict) -> None:
+        """Restore the dashboards saved with to_dict."""
+        self.messages.update((int(channel_id), message_id) for channel_id, message_id in data.items())
+
+    def stats(self) -> dict:
+        return {
+            "dashboards": len(self.messages),
+            "pending": len(self._pending),
+            "edits": self.edits,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+        }
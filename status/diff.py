@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+
+from status.snapshot import GameSnapshot, NationState
+
+# Deadlines are derived from minute-resolution time strings, so consecutive snapshots of
+# the same turn disagree by up to a minute plus the time spent fetching
+DEADLINE_TOLERANCE = 120
+
+
+@dataclass(frozen=True, slots=True)
+class SnapshotEvent:
+    """Something that changed between two consecutive snapshots of a game."""
+
+    game_id: str
+
+
+@dataclass(frozen=True, slots=True)
+class TurnAdvanced(SnapshotEvent):
+    previous_status: str
+    status: str
+    turn: int = None
+
+
+@dataclass(frozen=True, slots=True)
+class NationSubmitted(SnapshotEvent):
+    nation: str
+
+
+@dataclass(frozen=True, slots=True)
+class NationWentAI(SnapshotEvent):
+    nation: str
+
+
+@dataclass(frozen=True, slots=True)
+class NationDied(SnapshotEvent):
+    nation: str
+
+
+@dataclass(frozen=True, slots=True)
+class DeadlineMoved(SnapshotEvent):
+    previous_deadline: float
+    deadline: float
+
+    @property
+    def extended(self) -> bool:
+        return self.previous_deadline is None or (self.deadline is not None and self.deadline > self.previous_deadline)
+
+
+@dataclass(frozen=True, slots=True)
+class GameWon(SnapshotEvent):
+    status: str
+
+
+def diff_snapshots(old: GameSnapshot, new: GameSnapshot, deadline_tolerance: float = DEADLINE_TOLERANCE) -> list:
+    """
+    Compare two consecutive snapshots of a game and return what changed, in the order the
+    events happened: the turn or game end first, then the nations, then the deadline.
+
+    :param old: The previous snapshot, or None if the game was not seen before.
+    :param new: The latest snapshot.
+    :param deadline_tolerance: The seconds the deadline may drift between snapshots of the same turn.
+    :return: A list of SnapshotEvent, empty if nothing changed or either page had no status.
+    """
+    if old is None or not old.has_status or not new.has_status:
+        return []
+
+    events = []
+    game_id = new.game_id
+    turn_advanced = False
+    if new.status != old.status:
+        if new.is_won:
+            events.append(GameWon(game_id, new.status))
+        else:
+            turn_advanced = True
+            events.append(TurnAdvanced(game_id, old.status, new.status, new.turn))
+
+    if new.nations != old.nations:
+        previous_states = {nation.name: nation.state for nation in old.nations}
+        for nation in new.nations:
+            previous = previous_states.get(nation.name)
+            if previous is None or previous is nation.state:
+                continue
+            if nation.state is NationState.SUBMITTED and not turn_advanced:
+                # Nations start every turn unsubmitted, so only submissions within a turn are news
+                events.append(NationSubmitted(game_id, nation.name))
+            elif nation.state is NationState.COMPUTER:
+                events.append(NationWentAI(game_id, nation.name))
+            elif nation.state is NationState.DEAD:
+                events.append(NationDied(game_id, nation.name))
+
+    if not turn_advanced and not new.is_won:
+        previous_deadline, deadline = old.deadline, new.deadline
+        if (previous_deadline is None) != (deadline is None) or (
+            deadline is not None and abs(deadline - previous_deadline) > deadline_tolerance
+        ):
+            events.append(DeadlineMoved(game_id, previous_deadline, deadline))
+    return events
@@ -0,0 +1,230 @@
+import discord
+
+from status.snapshot import GameSnapshot, NationState, mention
+from status.stats import format_duration, histogram_percentile, merge_histograms
+
+STATUS_EMOJIS = {
+    NationState.SUBMITTED: ":ballot_box_with_check:",
+    NationState.UNSUBMITTED: ":x:",
+    NationState.COMPUTER: ":desktop:",
+    NationState.UNFINISHED: ":warning:",
+    NationState.DEAD: ":headstone:",
+    NationState.UNKNOWN: ":question:",
+    NationState.REMOVE_PRETENDER: ":skull:"
+}
+
+# Discord allows 25 fields per embed
+DASHBOARD_MAX_GAMES = 25
+# Discord allows 6000 characters per embed, some are kept for a footer
+EMBED_MAX_LENGTH = 6000
+EMBED_FOOTER_RESERVE = 64
+
+
+def status_embed(snapshot: GameSnapshot) -> discord.Embed:
+    """
+    Build the embed sent with turn change notifications and reminders.
+
+    :param snapshot: The snapshot of the game.
+    """
+    embed = discord.Embed(title=f'Lobby: {snapshot.lobby_name}', color=0xD75BF4)
+    embed.add_field(name="Game Status", value=snapshot.status or 'Unknown', inline=False)
+    if snapshot.address is not None:
+        embed.add_field(name="Game Address", value=snapshot.address, inline=False)
+    if snapshot.next_turn is not None:
+        embed.add_field(name="Next Turn", value=snapshot.next_turn, inline=False)
+    return embed
+
+
+def details_embed(snapshot: GameSnapshot, registered: dict) -> discord.Embed:
+    """
+    Build the embed of the details command.
+
+    :param snapshot: The snapshot of the game.
+    :param registered: The user IDs of the registered players of the game by nation name.
+    """
+    embed = discord.Embed(title=f'Lobby: {snapshot.lobby_name}', color=0xD75BF4)
+    if snapshot.status is not None:
+        embed.add_field(name="Game Status", value=snapshot.status, inline=False)
+    if snapshot.address is not None:
+        embed.add_field(name="Game Address", value=snapshot.address, inline=False)
+    if snapshot.next_turn is not None:
+        embed.add_field(name="Next Turn", value=snapshot.next_turn, inline=False)
+
+    # Create player list excluding computer and dead nations
+    player_list = []
+    for nation in snapshot.nations:
+        # Only add to player list if not computer or dead
+        if nation.state not in (NationState.COMPUTER, NationState.DEAD):
+            player_id = registered.get(nation.name)
+            player_mention = mention(player_id) if player_id else ''
+            player_list.append(f"{STATUS_EMOJIS[nation.state]} {nation.name} {player_mention}")
+
+    # Discord rejects empty field values
+    embed.add_field(name="**Status Summary**", value=status_summary(snapshot) or "No status available", inline=False)
+
+    if player_list:
+        embed.add_field(name="**Active Players**", value="\n".join(player_list), inline=False)
+    return embed
+
+
+def status_summary(snapshot: GameSnapshot) -> str:
+    """
+    Count the nations of a game by submission status, such as ":ballot_box_with_check: 5 | :x: 2".
+
+    :param snapshot: The snapshot of the game.
+    """
+    # Count players by status
+    status_counts = {
+        NationState.SUBMITTED: 0,
+        NationState.UNSUBMITTED: 0,
+        NationState.COMPUTER: 0,
+        NationState.UNFINISHED: 0,
+        NationState.DEAD: 0
+    }
+    for nation in snapshot.nations:
+        status_counts[nation.state] = status_counts.get(nation.state, 0) + 1
+    return " | ".join(f"{STATUS_EMOJIS[state]} {count}" for state, count in status_counts.items() if count > 0)
+
+
+def dashboard_embed(snapshots: dict) -> discord.Embed:
+    """
+    Build the dashboard of a channel, with a field per watched game.
+
+    :param snapshots: The latest snapshot of every game watched in the channel by game ID, None if not polled yet.
+    """
+    embed = discord.Embed(title="Watched Games", color=0xD75BF4, timestamp=discord.utils.utcnow())
+    if not snapshots:
+        embed.description = "No games are watched in this channel."
+    for game_id, snapshot in list(snapshots.items())[:DASHBOARD_MAX_GAMES]:
+        if snapshot is None:
+            embed.add_field(name=f"Game {game_id}", value="Waiting for the first poll", inline=False)
+            continue
+        lines = [snapshot.status or 'Unknown']
+        deadline = snapshot.deadline
+        if deadline is not None:
+            # Rendered by the client as a live countdown, so the dashboard needs no edit as time passes
+            lines.append(f"Next turn <t:{int(deadline)}:R>")
+        elif snapshot.next_turn:
+            lines.append(f"Next turn: {snapshot.next_turn}")
+        if snapshot.nations:
+            lines.append(status_summary(snapshot))
+        embed.add_field(name=f"{snapshot.lobby_name} ({game_id})", value="\n".join(lines), inline=False)
+    if len(snapshots) > DASHBOARD_MAX_GAMES:
+        embed.set_footer(text=f"{len(snapshots) - DASHBOARD_MAX_GAMES} more games not shown")
+    return embed
+
+
+def _add_line_fields(embed: discord.Embed, name: str, lines: list) -> int:
+    """
+    Add lines to fields named ``name``, as many as fit in the limits of the embed.
+
+    :return: The number of lines added.
+    """
+    # Discord limits field values to 1024 characters, and the whole embed to 25 fields and 6000 characters
+    budget = EMBED_MAX_LENGTH - EMBED_FOOTER_RESERVE - len(embed)
+    fields = len(embed.fields)
+    value = ""
+    added = 0
+    for line in lines:
+        if value and len(value) + len(line) + 1 > 1024:
+            embed.add_field(name=name, value=value, inline=False)
+            fields += 1
+            name, value = "\u200b", ""
+        cost = len(line) + 1 + (0 if value else len(name))
+        if cost > budget or (not value and fields >= DASHBOARD_MAX_GAMES):
+            break
+        budget -= cost
+        value = f"{value}\n{line}" if value else line
+        added += 1
+    if value:
+        embed.add_field(name=name, value=value, inline=False)
+    return added
+
+
+def _nation_stats_line(name: str, turns: int, last_to_submit: int, went_ai: int, histogram: dict) -> str:
+    line = (
+        f"**{name}**: median {format_duration(histogram_percentile(histogram, 0.5))}, "
+        f"p90 {format_duration(histogram_percentile(histogram, 0.9))}, last {last_to_submit}/{turns}"
+    )
+    return f"{line}, AI {went_ai}" if went_ai else line
+
+
+def game_stats_embed(game_id: str, lobby_name: str, game_stats, nation_stats: list) -> discord.Embed:
+    """
+    Build the embed of the stats command for a game.
+
+    :param game_id: The ID of the Dominions game.
+    :param lobby_name: The lobby name of the game, or None if unknown.
+    :param game_stats: The (turn, turn_started_at, turns, turn_seconds) aggregates of the game, or None.
+    :param nation_stats: The (nation, turns, submissions, last_to_submit, went_ai, submission time histogram) aggregates of its nations.
+    """
+    embed = discord.Embed(title=f'Stats: {lobby_name or f"Game {game_id}"}', color=0xD75BF4)
+    if game_stats is None or not game_stats[2]:
+        embed.description = "No complete turn observed yet."
+    else:
+        turns, turn_seconds = game_stats[2], game_stats[3]
+        embed.description = f"{turns} turns observed, {format_duration(turn_seconds / turns)} on average."
+
+    # Slowest nations first
+    nation_stats = sorted(nation_stats, key=lambda row: histogram_percentile(row[5], 0.5) or 0, reverse=True)
+    lines = [
+        _nation_stats_line(nation, turns, last_to_submit, went_ai, histogram)
+        for nation, turns, submissions, last_to_submit, went_ai, histogram in nation_stats
+    ]
+    shown = _add_line_fields(embed, "Time to submit", lines)
+    if shown < len(lines):
+        embed.set_footer(text=f"{len(lines) - shown} more nations not shown")
+    return embed
+
+
+def player_stats_embed(user: discord.abc.User, player_stats: list) -> discord.Embed:
+    """
+    Build the embed of the stats command for a player.
+
+    :param user: The player.
+    :param player_stats: The (game_id, nation, turns, submissions, last_to_submit, went_ai, submission time histogram) aggregates of the nations they play.
+    """
+    embed = discord.Embed(title=f"Stats: {user.display_name}", color=0xD75BF4)
+    if not player_stats:
+        embed.description = "Not registered in any game."
+        return embed
+    histogram = merge_histograms(row[6] for row in player_stats)
+    turns = sum(row[2] for row in player_stats)
+    embed.description = (
+        f"Median time to submit {format_duration(histogram_percentile(histogram, 0.5))}, "
+        f"p90 {format_duration(histogram_percentile(histogram, 0.9))}, "
+        f"last to submit in {sum(row[4] for row in player_stats)} of {turns} turns, "
+        f"went AI {sum(row[5] for row in player_stats)} times."
+    )
+    lines = [
+        _nation_stats_line(f"{nation} ({game_id})", turns, last_to_submit, went_ai, histogram)
+        for game_id, nation, turns, submissions, last_to_submit, went_ai, histogram in player_stats
+    ]
+    shown = _add_line_fields(embed, "Games", lines)
+    if shown < len(lines):
+        embed.set_footer(text=f"{len(lines) - shown} more games not shown")
+    return embed
+
+
+def turn_mentions(registered: dict) -> str:
+    """
+    Mention every registered player of a game, or @here if there are none.
+
+    :param registered: The user IDs of the registered players of the game by nation name.
+    """
+    return " ".join(mention(player_id) for player_id in registered.values()) or "@here"
+
+
+def reminder_mentions(snapshot: GameSnapshot, registered: dict) -> str:
+    """
+    Mention the registered players whose nation has not submitted its turn, or @here if there are none.
+
+    :param snapshot: The snapshot of the game.
+    :param registered: The user IDs of the registered players of the game by nation name.
+    """
+    mentions = ""
+    for nation in snapshot.nations_in(NationState.UNSUBMITTED):
+        player_id = registered.get(nation.name)
+        if player_id:
+            mentions += mention(player_id)
+    return mentions or "@here"
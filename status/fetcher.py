@@ -0,0 +1,389 @@
+import asyncio
+import dataclasses
+import hashlib
+import time
+from dataclasses import dataclass
+from enum import Enum
+
+import aiohttp
+
+from status.breaker import CircuitBreaker, backoff_delay
+from status.cache import SnapshotCache
+from status.capture_status import SectionScanner, next_turn_text, status_region
+from status.diff import DEADLINE_TOLERANCE
+from status.parse_pool import ParsePool
+from status.ratelimit import RequestGovernor, RequestPriority, RequestTicket
+from status.snapshot import GameSnapshot, turn_deadline
+
+
+class FetchError(Enum):
+    NOT_FOUND = "not found"
+    CLIENT = "client error"
+    SERVER = "server error"
+    TIMEOUT = "timeout"
+    CONNECTION = "connection error"
+    CIRCUIT_OPEN = "circuit open"
+    BUSY = "busy"
+
+    @classmethod
+    def from_status(cls, status: int) -> "FetchError":
+        if status in (404, 410):
+            return cls.NOT_FOUND
+        if status >= 500 or status in (408, 429):
+            # Failing, overloaded or rate limiting us, worth retrying later
+            return cls.SERVER
+        return cls.CLIENT
+
+    @property
+    def transient(self) -> bool:
+        """Whether the same request may succeed later."""
+        return self not in (FetchError.NOT_FOUND, FetchError.CLIENT)
+
+
+# The errors that count against the host and are retried
+RETRIED_ERRORS = (FetchError.SERVER, FetchError.TIMEOUT, FetchError.CONNECTION)
+
+# The bytes read from a response at a time when streaming
+STREAM_CHUNK = 16384
+
+
+@dataclass
+class FetchResult:
+    """The outcome of fetching a game page. ``status`` is 0 when no response was received."""
+
+    status: int
+    snapshot: GameSnapshot = None
+    source: str = "network"
+    digest: bytes = None
+    fetched_at: float = None
+    error: FetchError = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
+
+
+@dataclass
+class PageState:
+    """What is remembered about the last fetch of a game page."""
+
+    etag: str = None
+    last_modified: str = None
+    region_digest: bytes = None
+    result: FetchResult = None
+    fetched_at: float = None
+
+
+class GameFetcher:
+    """
+    Fetches and parses game pages from the blitzserver.
+
+    Repeated fetches of a game are made conditional with If-None-Match/If-Modified-Since when
+    the server sent validators. When it did not, the status region of the body is hashed
+    without the countdown to the next turn, and parsing is skipped if the hash matches the
+    previous fetch and the countdown still points to the same deadline. The snapshot is then
+    reused with the new countdown text. ``digest`` identifies the content of a page, deadline
+    included, so callers can tell whether a page changed since they last looked at it.
+
+    Concurrent fetches of the same game share a single request and parse.
+
+    Server errors, timeouts and connection errors are retried ``retries`` times with jittered
+    exponential backoff, and counted by a circuit breaker shared by every game. While the
+    breaker is open, fetches fail right away with ``FetchError.CIRCUIT_OPEN`` instead of
+    reaching the server.
+
+    Every request, retries included, takes a token from the request governor first. Command
+    fetches that can't get one within ``command_wait`` seconds fail with ``FetchError.BUSY``.
+
+    When ``streaming`` is on, pages are read in chunks until the sections the parser reads
+    are complete, and only those are hashed and parsed. The connection is then closed rather
+    than downloading the rest of the page. With a ``stream_tail``, pages ending within that
+    many more bytes are read to the end instead, so their connection can be reused.
+    """
+
+    def __init__(
+        self,
+        bot,
+        *,
+        base_url: str = "https://beta.blitzserver.net",
+        cache: SnapshotCache = None,
+        parse_pool: ParsePool = None,
+        breaker: CircuitBreaker = None,
+        governor: RequestGovernor = None,
+        command_wait: float = 10,
+        streaming: bool = True,
+        stream_tail: int = 0,
+        retries: int = 2,
+        retry_base: float = 1,
+        retry_cap: float = 10,
+    ) -> None:
+        """
+        :param bot: The bot whose shared HTTP session is used.
+        :param base_url: The base URL of the blitzserver.
+        :param cache: The cache holding the last page of every game fetched.
+        :param parse_pool: The pool parsing pages off the event loop.
+        :param breaker: The circuit breaker of the blitzserver host.
+        :param governor: The request budget shared by every fetch, unlimited if None.
+        :param command_wait: The longest time in seconds a command fetch waits for the request budget.
+        :param streaming: Whether to stop reading pages once the sections the parser reads are complete.
+        :param stream_tail: The most bytes read past those sections to reach the end of the page and keep the connection.
+        :param retries: The number of times a failed request is retried before giving up.
+        :param retry_base: The seconds before the first retry, doubled for each following one.
+        :param retry_cap: The longest delay in seconds between two retries.
+        """
+        self.bot = bot
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache or SnapshotCache()
+        self.parse_pool = parse_pool or ParsePool()
+        self.breaker = breaker or CircuitBreaker(self.base_url)
+        self.governor = governor
+        self.command_wait = command_wait
+        self.streaming = streaming
+        self.stream_tail = stream_tail
+        self.retries = retries
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self.in_flight = {}
+        self.tickets = {}  # The request budget tickets of the fetches in flight by game ID
+        self.requests = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.parsed = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.streamed = 0
+        self.bytes_read = 0
+        self.bytes_parsed = 0
+        self.bytes_not_downloaded = 0  # Only counted for pages whose length is known
+        self.bytes_not_parsed = 0
+        self.closed_early = 0
+        self.errors = {error: 0 for error in FetchError}
+
+    def game_url(self, game_id: str) -> str:
+        return f"{self.base_url}/game/{game_id}#status"
+
+    async def fetch(
+        self, game_id: str, max_age: float = None, priority: RequestPriority = RequestPriority.POLL
+    ) -> FetchResult:
+        """
+        Fetch the status of a game, joining a fetch of the same game that is already running.
+
+        :param game_id: The ID of the Dominions game.
+        :param max_age: If given, answer from the cache when its page is at most this many seconds old. Recently failed fetches are answered from the cache too.
+        :param priority: The priority of the request for the request budget.
+        :return: The parsed page.
+        """
+        if max_age is not None:
+            cached = self.cache.fresh(game_id, max_age)
+            if cached is not None:
+                return self._reuse(cached, "cache")
+
+        future = self.in_flight.get(game_id)
+        if future is None:
+            ticket = RequestTicket(priority)
+            future = asyncio.ensure_future(self._fetch(game_id, ticket))
+            self.in_flight[game_id] = future
+            self.tickets[game_id] = ticket
+            future.add_done_callback(lambda done: self._fetch_done(game_id, done))
+        else:
+            self.coalesced += 1
+            if priority is RequestPriority.POLL and self.governor is not None:
+                # A poll joining a command fetch must not wait behind the reserve like a command
+                self.governor.promote(self.tickets[game_id])
+        # A caller giving up must not cancel the fetch for the others waiting on it
+        return await asyncio.shield(future)
+
+    async def _fetch(self, game_id: str, ticket: RequestTicket) -> FetchResult:
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.errors[FetchError.CIRCUIT_OPEN] += 1
+                return FetchResult(status=0, fetched_at=time.monotonic(), error=FetchError.CIRCUIT_OPEN)
+            try:
+                if self.governor is not None and not await self.governor.acquire(
+                    ticket.priority,
+                    timeout=None if ticket.priority is RequestPriority.POLL else self.command_wait,
+                    ticket=ticket,
+                ):
+                    self.breaker.release()
+                    self.errors[FetchError.BUSY] += 1
+                    return FetchResult(status=0, fetched_at=time.monotonic(), error=FetchError.BUSY)
+                result = await self._request(game_id)
+            except BaseException:
+                self.breaker.release()
+                raise
+            if result.error not in RETRIED_ERRORS:
+                # Any answer but a server error shows the host is up, even a 404
+                self.breaker.record_success()
+                if result.error is not None:
+                    self.errors[result.error] += 1
+                return result
+            self.breaker.record_failure()
+            attempt += 1
+            if attempt > self.retries:
+                self.errors[result.error] += 1
+                return result
+            self.retried += 1
+            await asyncio.sleep(backoff_delay(attempt, base=self.retry_base, cap=self.retry_cap))
+
+    async def _request(self, game_id: str) -> FetchResult:
+        state = self.cache.get(game_id)
+        headers = {}
+        if state is not None:
+            if state.etag:
+                headers["If-None-Match"] = state.etag
+            if state.last_modified:
+                headers["If-Modified-Since"] = state.last_modified
+
+        self.requests += 1
+        try:
+            async with self.bot.http_session.get(self.game_url(game_id), headers=headers) as request:
+                if request.status == 304 and state is not None:
+                    self.not_modified += 1
+                    state.fetched_at = state.result.fetched_at = time.monotonic()
+                    return self._reuse(state.result, "not_modified")
+                if request.status != 200:
+                    return self._failed(game_id, request.status, FetchError.from_status(request.status))
+                if self.streaming:
+                    body = await self._read_sections(request)
+                else:
+                    body = await request.read()
+                    self.bytes_read += len(body)
+                    self.bytes_parsed += len(body)
+                try:
+                    encoding = request.get_encoding()
+                except RuntimeError:
+                    # No charset in the headers and the body wasn't read whole to guess it from
+                    encoding = "utf-8"
+                etag = request.headers.get("ETag")
+                last_modified = request.headers.get("Last-Modified")
+        except asyncio.TimeoutError:
+            return self._failed(game_id, 0, FetchError.TIMEOUT)
+        except aiohttp.ClientError:
+            return self._failed(game_id, 0, FetchError.CONNECTION)
+
+        region_digest = hashlib.blake2b(status_region(body), digest_size=16).digest()
+        next_turn = next_turn_text(body)
+        if state is not None and state.region_digest == region_digest:
+            observed_at = time.time()
+            if self._same_deadline(state.result.snapshot, next_turn, observed_at):
+                self.unchanged += 1
+                state.etag, state.last_modified = etag, last_modified
+                state.fetched_at = state.result.fetched_at = time.monotonic()
+                if next_turn != state.result.snapshot.next_turn:
+                    # Only the countdown moved on, show its current text without parsing again and keep
+                    # the deadline it matched
+                    state.result.snapshot = dataclasses.replace(
+                        state.result.snapshot, next_turn=next_turn, observed_at=observed_at
+                    )
+                return self._reuse(state.result, "unchanged")
+
+        lobby_name, players, game_info = await self.parse_pool.parse(body, encoding)
+        self.parsed += 1
+        snapshot = GameSnapshot.from_page(game_id, lobby_name, players, game_info)
+        result = FetchResult(
+            status=200,
+            snapshot=snapshot,
+            # The page may only differ from the previous one by its deadline
+            digest=hashlib.blake2b(region_digest + repr(snapshot.deadline).encode(), digest_size=16).digest(),
+            fetched_at=time.monotonic(),
+        )
+        self.cache.put(game_id, PageState(etag, last_modified, region_digest, result, result.fetched_at))
+        return result
+
+    @staticmethod
+    def _same_deadline(snapshot: GameSnapshot, next_turn: str, observed_at: float) -> bool:
+        """Whether a countdown read at ``observed_at`` ends at the deadline of a snapshot."""
+        if next_turn == snapshot.next_turn:
+            return True
+        deadline = turn_deadline(next_turn, observed_at)
+        if deadline is None or snapshot.deadline is None:
+            return deadline is None and snapshot.deadline is None
+        return abs(deadline - snapshot.deadline) <= DEADLINE_TOLERANCE
+
+    async def _read_sections(self, response: aiohttp.ClientResponse) -> bytes:
+        """
+        Read a page until the sections the parser reads are complete.
+
+        :return: The page up to the end of those sections, or the whole page if they weren't found.
+        """
+        scanner = SectionScanner()
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK):
+            if scanner.feed(chunk):
+                break
+        read = len(scanner.buffer)
+        if scanner.end is None:
+            self.bytes_read += read
+            self.bytes_parsed += read
+            return bytes(scanner.buffer)
+
+        while self.stream_tail and read - scanner.end <= self.stream_tail:
+            chunk = await response.content.read(STREAM_CHUNK)
+            if not chunk:
+                break
+            read += len(chunk)
+        if not response.content.at_eof():
+            # Give up the connection rather than download the rest of the page
+            self.closed_early += 1
+            response.close()
+            if response.content_length and "Content-Encoding" not in response.headers:
+                self.bytes_not_downloaded += max(0, response.content_length - read)
+        self.streamed += 1
+        self.bytes_read += read
+        self.bytes_parsed += scanner.end
+        self.bytes_not_parsed += read - scanner.end
+        return bytes(memoryview(scanner.buffer)[:scanner.end])
+
+    def _failed(self, game_id: str, status: int, error: FetchError) -> FetchResult:
+        result = FetchResult(status=status, fetched_at=time.monotonic(), error=error)
+        if not error.transient:
+            # Keep the last good page of games the server only failed to answer for now
+            self.cache.put(game_id, PageState(result=result, fetched_at=result.fetched_at))
+        return result
+
+    def cached(self, game_id: str) -> FetchResult:
+        """Return the last page of a game fetched successfully whatever its age, or None."""
+        state = self.cache.get(game_id)
+        return self._reuse(state.result, "cache") if state is not None else None
+
+    def forget(self, game_id: str) -> None:
+        """Drop the cached page of a game so the next fetch parses it again."""
+        self.cache.pop(game_id)
+
+    def stats(self) -> dict:
+        """Return how many fetches were answered without parsing the page."""
+        hits = self.not_modified + self.unchanged
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "unchanged": self.unchanged,
+            "parsed": self.parsed,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+            "streamed": self.streamed,
+            "bytes_read": self.bytes_read,
+            "bytes_parsed": self.bytes_parsed,
+            "bytes_not_downloaded": self.bytes_not_downloaded,
+            "bytes_not_parsed": self.bytes_not_parsed,
+            "closed_early": self.closed_early,
+            "errors": {error.value: count for error, count in self.errors.items() if count},
+            "hit_rate": hits / self.requests if self.requests else 0.0,
+        }
+
+    def _reuse(self, result: FetchResult, source: str) -> FetchResult:
+        return FetchResult(
+            status=result.status,
+            snapshot=result.snapshot,
+            source=source,
+            digest=result.digest,
+            fetched_at=result.fetched_at,
+            error=result.error,
+        )
+
+    def _fetch_done(self, game_id: str, future: asyncio.Future) -> None:
+        if self.in_flight.get(game_id) is future:
+            del self.in_flight[game_id]
+            del self.tickets[game_id]
+        if not future.cancelled():
+            # Mark the exception as retrieved in case every caller was cancelled
+            future.exception()
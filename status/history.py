@@ -0,0 +1,32 @@
+from status.snapshot import GameSnapshot
+
+
+def history_rows(previous: GameSnapshot, snapshot: GameSnapshot) -> list:
+    """
+    Return the turn history rows of a poll: one for the game status and one per nation,
+    only for what changed since the previous snapshot, so replaying the rows in order
+    rebuilds the state of the game at any time.
+
+    Rows without a nation record the game status. Nation rows record the submission status
+    of the nation.
+
+    :param previous: The previous snapshot of the game, or None if it has none.
+    :param snapshot: The latest snapshot of the game.
+    :return: A list of (game_id, turn, nation, status, observed_at) tuples.
+    """
+    if not snapshot.has_status or snapshot.status is None:
+        return []
+    if previous is not None and not previous.has_status:
+        previous = None
+    if previous is not None and previous.status == snapshot.status and previous.nations == snapshot.nations:
+        return []
+
+    game_id, turn, observed_at = snapshot.game_id, snapshot.turn, snapshot.observed_at
+    rows = []
+    if previous is None or previous.status != snapshot.status:
+        rows.append((game_id, turn, None, snapshot.status, observed_at))
+    previous_states = {} if previous is None else {nation.name: nation.state for nation in previous.nations}
+    for nation in snapshot.nations:
+        if previous_states.get(nation.name) is not nation.state:
+            rows.append((game_id, turn, nation.name, nation.state.value, observed_at))
+    return rows
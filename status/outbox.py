@@ -0,0 +1,189 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+import discord
+
+from status.ratelimit import TokenBucket
+
+
+class Priority(IntEnum):
+    """The order messages waiting for the same channel are sent in, lowest first."""
+
+    TURN = 0
+    REMINDER = 1
+    INFO = 2
+
+
+@dataclass(order=True)
+class OutboundMessage:
+    """A message waiting in the outbox."""
+
+    priority: Priority
+    seq: int
+    channel: object = field(compare=False)
+    content: str = field(default=None, compare=False)
+    embed: discord.Embed = field(default=None, compare=False)
+    key: str = field(default=None, compare=False)
+    enqueued_at: float = field(default=0.0, compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class Outbox:
+    """
+    Queues the messages the bot sends to channels on its own and paces them under the
+    Discord rate limits.
+
+    Every channel has its own queue, sent in priority order by a sender task that only runs
+    while the channel has messages waiting. Each channel is paced by its own token bucket,
+    and every send also takes a token from a bucket shared by all channels. A message queued
+    with the ``key`` of a message still waiting in the same channel is merged into it, so a
+    game that changes twice before its channel's turn comes only produces one message.
+    """
+
+    def __init__(
+        self,
+        *,
+        channel_rate: float = 1,
+        channel_burst: int = 5,
+        global_rate: float = 40,
+        logger=None,
+    ) -> None:
+        """
+        :param channel_rate: The messages per second sent to a single channel on average.
+        :param channel_burst: The messages that may be sent to a single channel at once.
+        :param global_rate: The messages per second sent to all channels together.
+        :param logger: The logger used to report failed sends.
+        """
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.logger = logger or logging.getLogger("discord_bot")
+        self._global_bucket = TokenBucket(global_rate)
+        self._buckets = {}  # channel ID -> TokenBucket
+        self._queues = {}  # channel ID -> heap of OutboundMessage
+        self._keyed = {}  # (channel ID, key) -> OutboundMessage
+        self._senders = {}  # channel ID -> sender task
+        self._counter = itertools.count()
+        self._closed = False
+        self.latencies = deque(maxlen=1000)
+        self.enqueued = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return sum(1 for queue in self._queues.values() for message in queue if not message.cancelled)
+
+    def send(self, channel, content: str = None, *, embed: discord.Embed = None, priority: Priority = Priority.INFO, key: str = None) -> bool:
+        """
+        Queue a message for a channel.
+
+        When a message with the same key is still waiting for the channel, the new message
+        replaces its content and embed if it is at least as urgent, otherwise only its embed,
+        so the channel gets the latest state with the most urgent text.
+
+        :param channel: The channel to send the message to.
+        :param content: The text of the message.
+        :param embed: The embed of the message.
+        :param priority: The priority of the message among those waiting for the channel.
+        :param key: Merges the message with a waiting message of the same key, such as the game ID.
+        :return: False if the outbox is closed.
+        """
+        if self._closed:
+            return False
+        self.enqueued += 1
+        if key is not None:
+            pending = self._keyed.get((channel.id, key))
+            if pending is not None:
+                self.coalesced += 1
+                if priority <= pending.priority:
+                    pending.content = content
+                    if priority < pending.priority:
+                        # Move it forward in the queue
+                        pending.cancelled = True
+                        self._push(channel, content, embed or pending.embed, priority, key, pending.enqueued_at)
+                        return True
+                if embed is not None:
+                    pending.embed = embed
+                return True
+        self._push(channel, content, embed, priority, key, time.monotonic())
+        return True
+
+    def _push(self, channel, content, embed, priority, key, enqueued_at) -> None:
+        message = OutboundMessage(priority, next(self._counter), channel, content, embed, key, enqueued_at)
+        heapq.heappush(self._queues.setdefault(channel.id, []), message)
+        if key is not None:
+            self._keyed[(channel.id, key)] = message
+        if channel.id not in self._senders:
+            self._senders[channel.id] = asyncio.create_task(self._send_loop(channel.id))
+
+    async def _send_loop(self, channel_id: int) -> None:
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = TokenBucket(self.channel_rate, self.channel_burst)
+        queue = self._queues[channel_id]
+        try:
+            while queue:
+                await bucket.acquire()
+                await self._global_bucket.acquire()
+                message = None
+                while queue:
+                    candidate = heapq.heappop(queue)
+                    if not candidate.cancelled:
+                        message = candidate
+                        break
+                if message is None:
+                    break
+                if message.key is not None:
+                    self._keyed.pop((channel_id, message.key), None)
+                try:
+                    await message.channel.send(content=message.content, embed=message.embed)
+                except (discord.HTTPException, discord.ClientException) as e:
+                    self.failed += 1
+                    self.logger.warning(f"Could not send message to channel {channel_id}: {type(e).__name__}: {e}")
+                else:
+                    self.delivered += 1
+                    self.latencies.append(time.monotonic() - message.enqueued_at)
+        finally:
+            if not queue:
+                del self._queues[channel_id]
+            del self._senders[channel_id]
+
+    async def close(self, timeout: float = 10) -> int:
+        """
+        Stop accepting messages and wait for the queued ones to be sent.
+
+        :param timeout: The seconds to wait before the remaining messages are dropped.
+        :return: The number of messages dropped.
+        """
+        self._closed = True
+        senders = list(self._senders.values())
+        if senders:
+            await asyncio.wait(senders, timeout=timeout)
+        dropped = len(self)
+        for task in self._senders.values():
+            task.cancel()
+        await asyncio.gather(*self._senders.values(), return_exceptions=True)
+        if dropped:
+            self.logger.warning(f"Dropped {dropped} queued messages on shutdown")
+        return dropped
+
+    def stats(self) -> dict:
+        """Return the queue depth, throughput and enqueue to delivery latency of the outbox."""
+        latencies = sorted(self.latencies)
+        return {
+            "pending": len(self),
+            "channels": len(self._senders),
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p90": latencies[int(len(latencies) * 0.9)] if latencies else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
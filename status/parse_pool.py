@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from status.capture_status import extract_status_data
+
+
+def parse_page(body: bytes, encoding: str, backend: str = None):
+    """
+    Parse a game page from its bytes, which the parser decodes itself. Runs inside the pool
+    workers, so it must stay importable at module level for the process pool.
+    """
+    return extract_status_data(body, backend=backend, encoding=encoding)
+
+
+class ParsePool:
+    """
+    Runs extract_status_data outside of the event loop.
+
+    In ``thread`` mode pages are parsed in a thread pool; in ``process`` mode they are parsed
+    in worker processes so parsing scales over every core. The workers are started from a
+    fork server, or spawned where there is none, since forking the threaded event loop
+    process can deadlock the children. They import the main module again without running
+    it, so it must guard its entry point with ``if __name__ == "__main__"``. At most
+    ``max_pending`` pages are submitted at once, further callers wait for a free slot. A
+    pool left broken by a dying worker, such as one killed for its memory, is replaced and
+    the page parsed once more.
+    """
+
+    MODES = ("thread", "process")
+
+    def __init__(
+        self,
+        *,
+        mode: str = "thread",
+        workers: int = None,
+        max_pending: int = 64,
+        backend: str = None,
+        logger=None,
+    ) -> None:
+        """
+        :param mode: Either ``thread`` or ``process``.
+        :param workers: The number of worker threads or processes, defaults to the CPU count.
+        :param max_pending: The number of pages that may be queued or parsing at the same time.
+        :param backend: The extract_status_data backend used by the workers.
+        :param logger: The logger used to report the pool configuration.
+        """
+        self.logger = logger or logging.getLogger("discord_bot")
+        if mode not in self.MODES:
+            self.logger.warning(f"Unknown parser pool mode '{mode}', using 'thread'")
+            mode = "thread"
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_pending)
+        self._executor = None
+        self.closed = False
+        self.pending = 0
+        self.parsed = 0
+        self.parse_time = 0.0
+        self.wait_time = 0.0
+        self.restarts = 0
+
+    def _get_executor(self):
+        if self.closed:
+            raise RuntimeError("The parser pool is shut down")
+        if self._executor is None:
+            if self.mode == "process":
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(start_method)
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="status-parser"
+                )
+            self.logger.info(f"Started {self.mode} parser pool with {self.workers} workers")
+        return self._executor
+
+    async def parse(self, body: bytes, encoding: str = "utf-8"):
+        """
+        Parse a game page in the pool.
+
+        :param body: The raw bytes of the game page.
+        :param encoding: The encoding of the page.
+        :return: The result of extract_status_data.
+        """
+        queued_at = time.perf_counter()
+        self.pending += 1
+        try:
+            async with self._slots:
+                started_at = time.perf_counter()
+                self.wait_time += started_at - queued_at
+                executor = self._get_executor()
+                try:
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        executor, parse_page, body, encoding, self.backend
+                    )
+                except BrokenExecutor:
+                    self._replace(executor)
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        self._get_executor(), parse_page, body, encoding, self.backend
+                    )
+                self.parse_time += time.perf_counter() - started_at
+                self.parsed += 1
+                return result
+        finally:
+            self.pending -= 1
+
+    def _replace(self, executor) -> None:
+        """Drop a broken executor so the next parse starts a new one, unless another parse already did."""
+        if self._executor is not executor:
+            return
+        self.restarts += 1
+        self.logger.warning(f"A worker of the {self.mode} parser pool died, restarting the pool")
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def shutdown(self) -> None:
+        """Stop the workers without waiting for queued pages. The pool cannot be used afterwards."""
+        self.closed = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "pending": self.pending,
+            "restarts": self.restarts,
+            "parsed": self.parsed,
+            "avg_parse_ms": self.parse_time / self.parsed * 1000 if self.parsed else 0.0,
+            "avg_wait_ms": self.wait_time / self.parsed * 1000 if self.parsed else 0.0,
+        }
@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from enum import IntEnum
+
+# The seconds over which the share of the request budget used is measured
+UTILIZATION_WINDOW = 60
+
+
+class TokenBucket:
+    """
+    Allows ``rate`` operations per second on average, with bursts of up to ``capacity``.
+    """
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        """
+        :param rate: The number of tokens added per second.
+        :param capacity: The largest number of tokens held, defaults to one second of tokens.
+        """
+        self.rate = rate
+        self.capacity = max(1.0, capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens if they are available right now."""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """The seconds until the tokens are available, 0 if they are now."""
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1) -> float:
+        """
+        Wait until the tokens are available and take them.
+
+        :return: The seconds spent waiting.
+        """
+        waited = 0.0
+        while not self.try_acquire(tokens):
+            delay = self.wait_time(tokens)
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+
+class RequestPriority(IntEnum):
+    """The order requests waiting for the request budget are sent in, lowest first."""
+
+    POLL = 0
+    COMMAND = 1
+
+
+class RequestTicket:
+    """
+    A request for a token whose priority can be raised while it waits, with RequestGovernor.promote.
+    """
+
+    def __init__(self, priority: RequestPriority = RequestPriority.POLL) -> None:
+        self.priority = priority
+        self.promoted = False
+        self._future = None  # Resolved when a token is granted
+        self._wakeup = None  # Resolved to wake the waiter up when it is promoted
+
+
+class RequestGovernor:
+    """
+    Shares a budget of ``rate`` requests per second between every code path sending requests
+    to a host.
+
+    Requests waiting for a token are granted in priority order, so watch polls go before
+    commands. Commands also leave ``reserve`` tokens in the bucket, so a burst of commands
+    can't spend the tokens the next polls need. A command request that a poll comes to
+    depend on can be promoted to poll priority while it waits.
+    """
+
+    def __init__(self, rate: float, burst: float = None, *, reserve: float = 0) -> None:
+        """
+        :param rate: The requests per second sent on average.
+        :param burst: The requests that may be sent at once, defaults to one second of requests.
+        :param reserve: The tokens only polls may take.
+        """
+        self.bucket = TokenBucket(rate, burst)
+        self.reserve = min(reserve, self.bucket.capacity - 1)
+        self._waiters = []  # (priority, seq, future)
+        self._counter = itertools.count()
+        self._task = None
+        self.granted = {priority: 0 for priority in RequestPriority}
+        self.waited = {priority: 0.0 for priority in RequestPriority}
+        self.timed_out = 0
+        self._recent = deque()  # Monotonic times of the recent grants
+
+    def _needed(self, priority: RequestPriority) -> float:
+        return 1 + (self.reserve if priority is RequestPriority.COMMAND else 0)
+
+    async def acquire(
+        self, priority: RequestPriority = RequestPriority.POLL, timeout: float = None, *, ticket: RequestTicket = None
+    ) -> bool:
+        """
+        Wait for a request token.
+
+        :param priority: The priority of the request.
+        :param timeout: The longest time in seconds to wait, or None to wait as long as needed.
+        :param ticket: A ticket to promote the request with while it waits. Its priority is used
+            instead of ``priority``, and promoting it lifts the timeout.
+        :return: False if no token was granted within the timeout.
+        """
+        ticket = ticket or RequestTicket(priority)
+        started_at = time.monotonic()
+        if not self._waiters and self.bucket.try_acquire(self._needed(ticket.priority)):
+            if ticket.priority is RequestPriority.COMMAND:
+                # Only one token is spent, the reserve was just checked for
+                self.bucket.tokens += self.reserve
+            self._granted(ticket.priority, started_at)
+            return True
+        loop = asyncio.get_running_loop()
+        future = ticket._future = loop.create_future()
+        heapq.heappush(self._waiters, (ticket.priority, next(self._counter), future))
+        if self._task is None:
+            self._task = asyncio.create_task(self._grant())
+        try:
+            while not future.done():
+                remaining = None
+                if timeout is not None and not ticket.promoted:
+                    remaining = started_at + timeout - time.monotonic()
+                    if remaining <= 0:
+                        future.cancel()
+                        self.timed_out += 1
+                        return False
+                ticket._wakeup = loop.create_future()
+                await asyncio.wait((future, ticket._wakeup), timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                # Granted as the waiter gave up, don't lose the token
+                self.bucket.tokens += 1
+            raise
+        finally:
+            ticket._future = ticket._wakeup = None
+        self._granted(ticket.priority, started_at)
+        return True
+
+    def promote(self, ticket: RequestTicket) -> None:
+        """
+        Raise a request to poll priority, whether it is waiting for a token or not yet.
+
+        :param ticket: The ticket the request was or will be made with.
+        """
+        if ticket.priority is RequestPriority.POLL:
+            return
+        ticket.priority = RequestPriority.POLL
+        ticket.promoted = True
+        if ticket._future is not None and not ticket._future.done():
+            # The entry queued as a command is skipped once this one is granted
+            heapq.heappush(self._waiters, (ticket.priority, next(self._counter), ticket._future))
+        if ticket._wakeup is not None and not ticket._wakeup.done():
+            ticket._wakeup.set_result(None)
+
+    async def _grant(self) -> None:
+        try:
+            while self._waiters:
+                priority, seq, future = self._waiters[0]
+                if future.done():
+                    heapq.heappop(self._waiters)
+                    continue
+                delay = self.bucket.wait_time(self._needed(priority))
+                if delay == 0:
+                    self.bucket.try_acquire(1)
+                    heapq.heappop(self._waiters)
+                    future.set_result(None)
+                    continue
+                # Sleep a little at most, a poll queued meanwhile may jump ahead
+                await asyncio.sleep(min(delay, 1 / self.bucket.rate))
+        finally:
+            self._task = None
+
+    def _granted(self, priority: RequestPriority, started_at: float) -> None:
+        now = time.monotonic()
+        self.granted[priority] += 1
+        self.waited[priority] += now - started_at
+        self._recent.append(now)
+        while self._recent and self._recent[0] < now - UTILIZATION_WINDOW:
+            self._recent.popleft()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        while self._recent and self._recent[0] < now - UTILIZATION_WINDOW:
+            self._recent.popleft()
+        return {
+            "rate": self.bucket.rate,
+            "utilization": len(self._recent) / (self.bucket.rate * UTILIZATION_WINDOW),
+            "waiting": len({id(waiter[2]) for waiter in self._waiters if not waiter[2].done()}),
+            "granted": {priority.name.lower(): count for priority, count in self.granted.items()},
+            "avg_wait": {
+                priority.name.lower(): self.waited[priority] / self.granted[priority] if self.granted[priority] else 0.0
+                for priority in RequestPriority
+            },
+            "timed_out": self.timed_out,
+        }
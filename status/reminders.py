@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+
+class ReminderTimers:
+    """
+    Fires reminders at fixed offsets before the turn deadline of each game.
+
+    Every armed game has one timer per offset in a heap ordered by wall clock fire time, and
+    a single task sleeps until the earliest one. Games are only re-armed when their deadline
+    changes, so polls do no reminder work in between.
+    """
+
+    def __init__(self, fire, *, offsets: list = (12 * 3600, 3 * 3600, 1800), logger=None) -> None:
+        """
+        :param fire: Coroutine function called with a game ID and the offset in seconds of the reminder that is due.
+        :param offsets: The seconds before the deadline reminders are sent at.
+        :param logger: The logger used to report failing reminders.
+        """
+        self.fire = fire
+        self.offsets = sorted(set(offsets), reverse=True)
+        self.logger = logger or logging.getLogger("discord_bot")
+        self._heap = []
+        self._armed = {}  # game ID -> (deadline, generation)
+        self._fired = {}  # game ID -> offsets fired for the current turn
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._running = set()
+        self.fired = 0
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._armed
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [task for task in (self._task, *self._running) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def arm(self, game_id: str, deadline: float, catch_up: bool = True) -> None:
+        """
+        Schedule the reminders of a game for a deadline, replacing the previous ones.
+
+        Offsets still ahead are scheduled, and may fire again if the deadline moved back.
+        Of the offsets already passed that did not fire this turn, the one closest to the
+        deadline fires right away when ``catch_up`` is set, the others are skipped.
+
+        :param game_id: The ID of the Dominions game.
+        :param deadline: The wall clock time of the next turn.
+        :param catch_up: Whether to send a reminder now for a passed offset.
+        """
+        now = time.time()
+        generation = next(self._counter)
+        self._armed[game_id] = (deadline, generation)
+        fired = self._fired.setdefault(game_id, set())
+        missed = []
+        for offset in self.offsets:
+            fire_at = deadline - offset
+            if fire_at > now:
+                fired.discard(offset)
+                heapq.heappush(self._heap, (fire_at, generation, game_id, offset))
+            elif offset not in fired:
+                missed.append(offset)
+        if catch_up and missed and deadline > now:
+            heapq.heappush(self._heap, (now, generation, game_id, min(missed)))
+            missed.remove(min(missed))
+        fired.update(missed)
+        self._wakeup.set()
+
+    def new_turn(self, game_id: str, deadline: float = None) -> None:
+        """
+        Forget the reminders sent for the previous turn of a game and arm it for the new one.
+
+        :param game_id: The ID of the Dominions game.
+        :param deadline: The wall clock time of the next turn, or None if unknown.
+        """
+        self._fired.pop(game_id, None)
+        if deadline is None:
+            self._armed.pop(game_id, None)
+        else:
+            self.arm(game_id, deadline)
+
+    def disarm(self, game_id: str) -> None:
+        """Cancel the reminders of a game."""
+        self._armed.pop(game_id, None)
+        self._fired.pop(game_id, None)
+
+    def pending(self) -> int:
+        return sum(1 for fire_at, generation, game_id, offset in self._heap if self._is_current(game_id, generation))
+
+    def stats(self) -> dict:
+        return {
+            "armed": len(self._armed),
+            "pending": self.pending(),
+            "fired": self.fired,
+        }
+
+    def _is_current(self, game_id: str, generation: int) -> bool:
+        armed = self._armed.get(game_id)
+        return armed is not None and armed[1] == generation
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            fire_at, generation, game_id, offset = self._heap[0]
+            if not self._is_current(game_id, generation):
+                # Superseded by a re-arm or disarmed
+                heapq.heappop(self._heap)
+                continue
+            delay = fire_at - time.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    # Wake up at least every minute in case the wall clock jumped
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, 60))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            self._fired.setdefault(game_id, set()).add(offset)
+            self.fired += 1
+            task = asyncio.create_task(self._fire(game_id, offset))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _fire(self, game_id: str, offset: float) -> None:
+        try:
+            await self.fire(game_id, offset)
+        except Exception as e:
+            self.logger.error(f"Reminder of game {game_id} failed: {type(e).__name__}: {e}")
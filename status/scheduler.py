@@ -0,0 +1,245 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+
+
+class PollPolicy:
+    """
+    Chooses the delay until the next poll of a game from its turn deadline.
+
+    Games whose deadline is far away are polled sparsely, while games close to their deadline,
+    past it, or whose status changed recently are polled at the minimum interval.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 60,
+        min_interval: float = 30,
+        max_interval: float = 900,
+        deadline_fraction: float = 0.1,
+        change_window: float = 600,
+    ) -> None:
+        """
+        :param interval: The delay used when the deadline of a game is unknown.
+        :param min_interval: The shortest delay between two polls of a game.
+        :param max_interval: The longest delay between two polls of a game.
+        :param deadline_fraction: The fraction of the time left until the deadline waited before the next poll.
+        :param change_window: The number of seconds after a status change during which the game is polled at the minimum interval.
+        """
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.deadline_fraction = deadline_fraction
+        self.change_window = change_window
+
+    @classmethod
+    def from_config(cls, config: dict) -> "PollPolicy":
+        """
+        :param config: The ``watch`` section of the bot config.
+        """
+        interval = config.get("poll_interval", 60)
+        return cls(
+            interval=interval,
+            min_interval=config.get("min_interval", min(30, interval)),
+            max_interval=config.get("max_interval", 900),
+            deadline_fraction=config.get("deadline_fraction", 0.1),
+            change_window=config.get("change_window", 600),
+        )
+
+    def delay(self, deadline: float = None, last_change: float = None, now: float = None) -> float:
+        """
+        :param deadline: The wall clock time of the next turn, or None if unknown.
+        :param last_change: The wall clock time of the last status change, or None.
+        :param now: The current wall clock time, defaults to time.time().
+        :return: The delay in seconds until the next poll.
+        """
+        now = time.time() if now is None else now
+        if last_change is not None and now - last_change < self.change_window:
+            return self.min_interval
+        if deadline is None:
+            return min(max(self.interval, self.min_interval), self.max_interval)
+        remaining = deadline - now
+        if remaining <= self.min_interval:
+            return self.min_interval
+        delay = remaining * self.deadline_fraction
+        return min(max(delay, self.min_interval), self.max_interval, remaining)
+
+
+class PollScheduler:
+    """
+    Central scheduler for watched game polls.
+
+    Every watched game has a single entry in a priority queue ordered by its next due time.
+    A dispatcher hands due games to a bounded pool of workers, so the polling cost scales
+    with the number of distinct games rather than the number of running coroutines.
+    """
+
+    def __init__(self, poll, *, workers: int = 4, error_delay: float = 60, logger=None) -> None:
+        """
+        :param poll: Coroutine function called with a game ID. It returns the delay in seconds until the next poll, or None to stop watching the game.
+        :param workers: The number of polls that may run at the same time.
+        :param error_delay: The delay in seconds before retrying a poll that raised an exception.
+        :param logger: The logger used to report failing polls.
+        """
+        self.poll = poll
+        self.workers = max(1, workers)
+        self.error_delay = error_delay
+        self.logger = logger or logging.getLogger("discord_bot")
+        self._heap = []
+        self._entries = {}
+        self._watched = set()
+        self._in_flight = set()
+        self._counter = itertools.count()
+        self._queue = asyncio.Queue(maxsize=self.workers)
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self.polls = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._watched
+
+    def __len__(self) -> int:
+        return len(self._watched)
+
+    def start(self) -> None:
+        """Start the dispatcher and the worker pool."""
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._dispatch()))
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def stop(self) -> None:
+        """Cancel the dispatcher and every worker."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def add(self, game_id: str, delay: float = 0) -> bool:
+        """
+        Start polling a game.
+
+        :param game_id: The ID of the Dominions game.
+        :param delay: The delay in seconds before the first poll.
+        :return: False if the game was already watched.
+        """
+        if game_id in self._watched:
+            return False
+        self._watched.add(game_id)
+        if game_id not in self._in_flight:
+            self._push(game_id, delay)
+        return True
+
+    def add_staggered(self, game_ids: list, *, rate: float = 2, jitter: float = 5) -> int:
+        """
+        Start polling many games without polling them all at once, as when restoring watches
+        on startup. The first polls are spread at ``rate`` per second in the given order, and
+        each is delayed by up to ``jitter`` more seconds.
+
+        :param game_ids: The IDs of the Dominions games, the most urgent first.
+        :param rate: The number of first polls started per second.
+        :param jitter: The largest random delay in seconds added to each first poll.
+        :return: The number of games added.
+        """
+        added = 0
+        for game_id in game_ids:
+            if self.add(game_id, delay=added / max(rate, 0.001) + random.uniform(0, jitter)):
+                added += 1
+        return added
+
+    def remove(self, game_id: str) -> bool:
+        """
+        Stop polling a game. A poll already running for it finishes but is not rescheduled.
+
+        :param game_id: The ID of the Dominions game.
+        :return: False if the game was not watched.
+        """
+        if game_id not in self._watched:
+            return False
+        self._watched.discard(game_id)
+        self._entries.pop(game_id, None)
+        return True
+
+    def stats(self) -> dict:
+        """Return the queue depth, lag and throughput counters of the scheduler."""
+        now = time.monotonic()
+        overdue = sum(
+            1
+            for due, seq, game_id in self._heap
+            if due <= now and self._entries.get(game_id) == seq
+        )
+        next_due = min(
+            (due for due, seq, game_id in self._heap if self._entries.get(game_id) == seq),
+            default=None,
+        )
+        return {
+            "watched": len(self._watched),
+            "in_flight": len(self._in_flight),
+            "queue_depth": overdue + self._queue.qsize(),
+            "next_due_in": None if next_due is None else max(0.0, next_due - now),
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "polls": self.polls,
+            "errors": self.errors,
+        }
+
+    def _push(self, game_id: str, delay: float) -> None:
+        seq = next(self._counter)
+        self._entries[game_id] = seq
+        heapq.heappush(self._heap, (time.monotonic() + max(0.0, delay), seq, game_id))
+        self._wakeup.set()
+
+    async def _dispatch(self) -> None:
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            due, seq, game_id = self._heap[0]
+            if self._entries.get(game_id) != seq:
+                # Superseded by a newer entry or removed
+                heapq.heappop(self._heap)
+                continue
+            delay = due - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            del self._entries[game_id]
+            self._in_flight.add(game_id)
+            await self._queue.put((game_id, due))
+
+    async def _work(self) -> None:
+        while True:
+            game_id, due = await self._queue.get()
+            lag = time.monotonic() - due
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            try:
+                delay = await self.poll(game_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"Poll of game {game_id} failed: {type(e).__name__}: {e}")
+                delay = self.error_delay
+            finally:
+                self.polls += 1
+                self._in_flight.discard(game_id)
+                self._queue.task_done()
+            if delay is None:
+                self._watched.discard(game_id)
+            elif game_id in self._watched:
+                self._push(game_id, delay)
@@ -0,0 +1,156 @@
+import re
+import sys
+import time
+from dataclasses import dataclass
+from enum import Enum
+
+from status.capture_status import parse_time_string
+
+TURN_PATTERN = re.compile(r"turn\s+(\d+)", re.IGNORECASE)
+MENTION_PATTERN = re.compile(r"<@!?(\d+)>")
+
+
+def turn_deadline(next_turn: str, observed_at: float) -> float:
+    """
+    Return the wall clock time of the next turn from the countdown on a game page.
+
+    :param next_turn: The text of the Next turn row, or None if the page had none.
+    :param observed_at: The wall clock time the page was fetched.
+    :return: The deadline, or None if the countdown shows no time left.
+    """
+    hours = parse_time_string(next_turn) if next_turn else 0
+    return observed_at + hours * 3600 if hours > 0 else None
+
+
+class NationState(Enum):
+    """The submission status of a nation as shown on the game page."""
+
+    SUBMITTED = "submitted"
+    UNSUBMITTED = "unsubmitted"
+    UNFINISHED = "unfinished"
+    COMPUTER = "computer"
+    DEAD = "dead"
+    REMOVE_PRETENDER = "remove pretender"
+    UNKNOWN = "unknown"
+
+    @classmethod
+    def from_text(cls, text: str) -> "NationState":
+        return cls._value2member_map_.get(text.strip().lower(), cls.UNKNOWN)
+
+
+@dataclass(frozen=True, slots=True)
+class NationStatus:
+    """A nation of a game and its submission status."""
+
+    name: str
+    state: NationState
+
+
+@dataclass(frozen=True, slots=True)
+class GameSnapshot:
+    """
+    The state of a game at the time its page was parsed.
+
+    Nation names are interned, so the many snapshots of long-running games share them. The
+    deadline is computed from the countdown once, when the snapshot is built.
+    """
+
+    game_id: str
+    lobby_name: str
+    status: str = None
+    next_turn: str = None
+    address: str = None
+    nations: tuple = ()
+    observed_at: float = 0.0
+    has_status: bool = True
+    deadline: float = None
+
+    @classmethod
+    def from_page(cls, game_id: str, lobby_name: str, players, game_info, observed_at: float = None) -> "GameSnapshot":
+        """
+        Build a snapshot from the output of extract_status_data.
+
+        :param game_id: The ID of the Dominions game.
+        :param lobby_name: The lobby name extracted from the page.
+        :param players: The players extracted from the page, or a message if the page had no status.
+        :param game_info: The game info extracted from the page, or a message if the page had no status.
+        :param observed_at: The wall clock time the page was fetched, defaults to now.
+        """
+        observed_at = time.time() if observed_at is None else observed_at
+        if not isinstance(game_info, dict):
+            return cls(game_id, lobby_name, observed_at=observed_at, has_status=False)
+        next_turn = game_info.get("next_turn")
+        return cls(
+            game_id,
+            lobby_name,
+            status=game_info.get("status"),
+            next_turn=next_turn,
+            address=game_info.get("address"),
+            nations=tuple(
+                NationStatus(sys.intern(player["nation_name"]), NationState.from_text(player["status"]))
+                for player in players
+            ),
+            observed_at=observed_at,
+            deadline=turn_deadline(next_turn, observed_at),
+        )
+
+    @property
+    def turn(self) -> int:
+        """The turn number in the game status, or None if it has none."""
+        match = TURN_PATTERN.search(self.status or "")
+        return int(match.group(1)) if match else None
+
+    @property
+    def is_won(self) -> bool:
+        return "Won" in (self.status or "")
+
+    def nations_in(self, state: NationState) -> list:
+        return [nation for nation in self.nations if nation.state is state]
+
+    def to_dict(self) -> dict:
+        return {
+            "lobby_name": self.lobby_name,
+            "status": self.status,
+            "next_turn": self.next_turn,
+            "address": self.address,
+            "nations": [[nation.name, nation.state.value] for nation in self.nations],
+            "observed_at": self.observed_at,
+            "has_status": self.has_status,
+        }
+
+    @classmethod
+    def from_dict(cls, game_id: str, data: dict) -> "GameSnapshot":
+        """Rebuild a snapshot saved with to_dict, or from the older status/next_turn dict."""
+        observed_at = data.get("observed_at", 0.0)
+        return cls(
+            game_id,
+            data.get("lobby_name", ""),
+            status=data.get("status"),
+            next_turn=data.get("next_turn"),
+            address=data.get("address"),
+            nations=tuple(
+                NationStatus(sys.intern(name), NationState.from_text(state))
+                for name, state in data.get("nations", [])
+            ),
+            observed_at=observed_at,
+            has_status=data.get("has_status", True),
+            deadline=turn_deadline(data.get("next_turn"), observed_at),
+        )
+
+
+def parse_player_id(value) -> int:
+    """
+    Return the user ID of a registered player, stored either as an int or as an older mention string.
+
+    :return: The user ID, or None if the value holds none.
+    """
+    if isinstance(value, int):
+        return value
+    match = MENTION_PATTERN.search(str(value))
+    if match:
+        return int(match.group(1))
+    return int(value) if str(value).isdigit() else None
+
+
+def mention(player_id: int) -> str:
+    return f"<@{player_id}>"
@@ -0,0 +1,118 @@
+from bisect import bisect_left
+
+from status.diff import NationSubmitted, NationWentAI, TurnAdvanced
+from status.snapshot import GameSnapshot, NationState
+
+WAITING_STATES = (NationState.UNSUBMITTED, NationState.UNFINISHED)
+PLAYING_STATES = (NationState.SUBMITTED, NationState.UNSUBMITTED, NationState.UNFINISHED)
+
+# The upper bounds in seconds of the buckets of the submission time histograms, from a minute
+# to two weeks, 25% apart. Longer times fall in one last bucket.
+SUBMIT_BUCKETS = tuple(60 * 1.25 ** i for i in range(46))
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Return the value below which ``fraction`` of the values fall, or None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def submit_bucket(seconds: float) -> int:
+    """Return the index of the histogram bucket a time to submit falls in."""
+    return bisect_left(SUBMIT_BUCKETS, seconds)
+
+
+def histogram_percentile(histogram: dict, fraction: float) -> float:
+    """
+    Return the value below which ``fraction`` of the values counted in a submission time
+    histogram fall, rounded up to the bound of its bucket, or None if it is empty.
+
+    :param histogram: The number of values by bucket index.
+    """
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = min(total - 1, int(total * fraction))
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen > rank:
+            return SUBMIT_BUCKETS[min(bucket, len(SUBMIT_BUCKETS) - 1)]
+
+
+def merge_histograms(histograms) -> dict:
+    merged = {}
+    for histogram in histograms:
+        for bucket, count in histogram.items():
+            merged[bucket] = merged.get(bucket, 0) + count
+    return merged
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration such as "1d 3h", "5h 12m", "8m" or "40s"."""
+    if seconds is None:
+        return "-"
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
+class StatsRecorder:
+    """
+    Keeps the /stats aggregates up to date from the events of every poll, so the command
+    reads a handful of precomputed rows instead of scanning the turn history.
+
+    Times to submit are measured from the poll that observed the turn change to the poll
+    that observed the submission, so they are as precise as the poll intervals.
+    """
+
+    def __init__(self, database) -> None:
+        """
+        :param database: The DatabaseManager of the bot.
+        """
+        self.database = database
+
+    async def record(self, previous: GameSnapshot, snapshot: GameSnapshot, events: list) -> None:
+        """
+        Update the aggregates of a game from the events of a poll.
+
+        :param previous: The previous snapshot of the game.
+        :param snapshot: The latest snapshot of the game.
+        :param events: The events diff_snapshots returned for the two snapshots.
+        """
+        game_id = snapshot.game_id
+        for event in events:
+            if isinstance(event, TurnAdvanced):
+                await self._end_turn(previous, snapshot)
+            elif isinstance(event, NationSubmitted):
+                stats = await self.database.get_game_stats(game_id)
+                if stats is not None and stats[0] == snapshot.turn and stats[1] is not None:
+                    seconds = snapshot.observed_at - stats[1]
+                    await self.database.add_submission(
+                        game_id, event.nation, snapshot.turn, seconds, submit_bucket(seconds)
+                    )
+            elif isinstance(event, NationWentAI):
+                await self.database.increment_nation_stats(game_id, [event.nation], "went_ai")
+
+    async def _end_turn(self, previous: GameSnapshot, snapshot: GameSnapshot) -> None:
+        game_id = snapshot.game_id
+        if snapshot.turn is None:
+            return
+        stats = await self.database.get_game_stats(game_id)
+        if stats is not None and previous.turn is not None and stats[0] == previous.turn:
+            # The whole turn was observed, so who held it up is known
+            playing = [nation.name for nation in previous.nations if nation.state in PLAYING_STATES]
+            waiting = [nation.name for nation in previous.nations if nation.state in WAITING_STATES]
+            last = waiting or await self.database.get_last_submitters(game_id, previous.turn)
+            await self.database.increment_nation_stats(game_id, playing, "turns")
+            await self.database.increment_nation_stats(game_id, last, "last_to_submit")
+        await self.database.record_turn(game_id, snapshot.turn, snapshot.observed_at)
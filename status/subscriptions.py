@@ -0,0 +1,115 @@
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class Subscription:
+    """A channel receiving the updates of a watched game."""
+
+    channel_id: int
+    guild_id: int = None
+    mentions: bool = True
+    reminders: bool = True
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        del data["channel_id"]
+        return data
+
+
+class SubscriptionRegistry:
+    """
+    The channels subscribed to each watched game.
+
+    A game is polled once however many channels watch it, and every update is fanned out to
+    its subscribers, each with its own mention and reminder settings.
+    """
+
+    def __init__(self) -> None:
+        self.games = {}  # game ID -> {channel ID: Subscription}
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self.games
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def __iter__(self):
+        return iter(self.games)
+
+    def subscribe(self, game_id: str, subscription: Subscription) -> bool:
+        """
+        Subscribe a channel to a game, replacing the settings of an existing subscription.
+
+        :param game_id: The ID of the Dominions game.
+        :param subscription: The subscription of the channel.
+        :return: False if the channel was already subscribed to the game.
+        """
+        subscribers = self.games.setdefault(game_id, {})
+        is_new = subscription.channel_id not in subscribers
+        subscribers[subscription.channel_id] = subscription
+        return is_new
+
+    def unsubscribe(self, game_id: str, channel_id: int) -> bool:
+        """
+        Unsubscribe a channel from a game, forgetting the game once it has no subscribers left.
+
+        :param game_id: The ID of the Dominions game.
+        :param channel_id: The ID of the channel.
+        :return: False if the channel was not subscribed to the game.
+        """
+        subscribers = self.games.get(game_id)
+        if not subscribers or subscribers.pop(channel_id, None) is None:
+            return False
+        if not subscribers:
+            del self.games[game_id]
+        return True
+
+    def remove_game(self, game_id: str) -> list:
+        """
+        Unsubscribe every channel from a game.
+
+        :return: The removed subscriptions.
+        """
+        return list(self.games.pop(game_id, {}).values())
+
+    def get(self, game_id: str, channel_id: int) -> Subscription:
+        return self.games.get(game_id, {}).get(channel_id)
+
+    def for_game(self, game_id: str) -> list:
+        """The subscriptions of a game."""
+        return list(self.games.get(game_id, {}).values())
+
+    def for_channel(self, channel_id: int) -> list:
+        """The IDs of the games a channel is subscribed to."""
+        return sorted(game_id for game_id, subscribers in self.games.items() if channel_id in subscribers)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self.games.values())
+
+    def to_dict(self) -> dict:
+        return {
+            game_id: {str(channel_id): subscription.to_dict() for channel_id, subscription in subscribers.items()}
+            for game_id, subscribers in self.games.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SubscriptionRegistry":
+        """
+        Rebuild a registry saved with to_dict, or from the older single channel watches of
+        the form ``{game ID: {"channel_id": ..., "guild_id": ...}}``.
+        """
+        registry = cls()
+        for game_id, subscribers in data.items():
+            if "channel_id" in subscribers:
+                subscribers = {str(subscribers["channel_id"]): {"guild_id": subscribers.get("guild_id")}}
+            for channel_id, settings in subscribers.items():
+                registry.subscribe(
+                    game_id,
+                    Subscription(
+                        int(channel_id),
+                        guild_id=settings.get("guild_id"),
+                        mentions=settings.get("mentions", True),
+                        reminders=settings.get("reminders", True),
+                    ),
+                )
+        return registry
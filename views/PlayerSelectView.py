@@ -2,29 +2,27 @@ import discord
 from discord.ext import commands, tasks
 from discord.ext.commands import Context
 class PlayerSelectView(discord.ui.View):
-    def __init__(self, bot, game_id, nation_name, guild):
+    def __init__(self, bot, game_id, nation_name):
         super().__init__()
         self.bot = bot
         self.game_id = game_id
         self.nation_name = nation_name
 
-        # Create the select menu
-        select = discord.ui.Select(
+        # Discord searches the members of the guild itself, so the bot doesn't need to cache them
+        select = discord.ui.UserSelect(
             placeholder="Select a player",
             min_values=1,
             max_values=1,
-            options=[
-                        discord.SelectOption(
-                            label=member.display_name,
-                            value=str(member.id),
-                            description=f"@{member.name}"
-                        ) for member in guild.members if not member.bot
-                    ][:25]  # Discord has a limit of 25 options
         )
 
         async def select_callback(interaction: discord.Interaction):
-            user_id = select.values[0]
-            user = interaction.guild.get_member(int(user_id))
+            user = select.values[0]
+            if user.bot:
+                await interaction.response.send_message(
+                    "Bots can't be registered as players.",
+                    ephemeral=True
+                )
+                return
 
             # Get the Dominions cog instance
             dominions_cog = self.bot.get_cog('dominions')
@@ -36,9 +34,7 @@ class PlayerSelectView(discord.ui.View):
                 return
 
             # Register the player
-            if self.game_id not in dominions_cog.registered_players:
-                dominions_cog.registered_players[self.game_id] = {}
-            dominions_cog.registered_players[self.game_id][self.nation_name] = user.mention
+            await self.bot.database.register_player(self.game_id, self.nation_name, user.id)
 
             # Send confirmation embed
             confirm_embed = discord.Embed(